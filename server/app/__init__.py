@@ -115,8 +115,9 @@
 # if __name__ == '__main__':
 #     app.run(debug=True, host='0.0.0.0', port=5000)
 
-from flask import Flask, jsonify
+from flask import Flask, abort, jsonify, request
 from flask_cors import CORS
+import logging
 import os
 
 ALLOWED_ORIGINS = [
@@ -135,6 +136,34 @@ def create_app(config_name=None):
     app.config.from_object('app.config.Config')
     app.url_map.strict_slashes = False
 
+    # ── Logging ──────────────────────────────────────────────────────────────
+    logging.basicConfig(
+        level=app.config['LOG_LEVEL'],
+        format='%(asctime)s %(levelname)s [%(name)s] %(message)s',
+    )
+
+    # ── JSON ─────────────────────────────────────────────────────────────────
+    # orjson-backed jsonify() for every route (large ml-history payloads)
+    from app.utils.json_provider import OrjsonProvider
+    app.json = OrjsonProvider(app)
+
+    # ── Supabase ─────────────────────────────────────────────────────────────
+    # Build the shared clients at startup so the first requests (and the
+    # worker threads they fan out to) don't race to create them.
+    from app.services.supabase_client import supabase_client
+    if app.config.get('SUPABASE_URL') and app.config.get('SUPABASE_KEY'):
+        supabase_client.initialize(app.config['SUPABASE_URL'], app.config['SUPABASE_KEY'])
+    if app.config.get('SUPABASE_URL') and app.config.get('SUPABASE_SERVICE_KEY'):
+        supabase_client.initialize_admin(app.config['SUPABASE_URL'], app.config['SUPABASE_SERVICE_KEY'])
+
+    # ── Compression ──────────────────────────────────────────────────────────
+    from flask_compress import Compress
+    Compress(app)
+
+    # ── Cache ────────────────────────────────────────────────────────────────
+    from app.services.cache import cache
+    cache.init_app(app)
+
     # ── CORS ─────────────────────────────────────────────────────────────────
     # Single source of truth — no manual before/after_request handlers needed.
     # flask_cors handles OPTIONS preflights automatically.
@@ -145,6 +174,16 @@ def create_app(config_name=None):
          supports_credentials=True,
          max_age=3600)
 
+    # ── Request limits ───────────────────────────────────────────────────────
+    # Reject oversized bodies before any view parses them. Werkzeug only
+    # raises its 413 lazily inside get_json(), where the views' blanket
+    # `except Exception` would turn it into a 500.
+    @app.before_request
+    def reject_oversized_body():
+        limit = request.max_content_length
+        if limit is not None and (request.content_length or 0) > limit:
+            abort(413)
+
     # ── Startup diagnostics ───────────────────────────────────────────────────
     print("=" * 60)
     print("📧 SENDGRID CONFIGURATION:")
@@ -218,6 +257,10 @@ def create_app(config_name=None):
     def method_not_allowed(error):
         return jsonify({'error': 'Method not allowed'}), 405
 
+    @app.errorhandler(413)
+    def payload_too_large(error):
+        return jsonify({'error': 'Payload too large'}), 413
+
     @app.errorhandler(500)
     def internal_error(error):
         return jsonify({'error': 'Internal server error'}), 500
@@ -34,12 +34,30 @@ class Config:
     # Upload
     MAX_UPLOAD_SIZE = int(os.getenv('MAX_UPLOAD_SIZE', 10485760))
     ALLOWED_EXTENSIONS = set(os.getenv('ALLOWED_EXTENSIONS', 'jpg,jpeg,png').split(','))
+    # Bodies are JSON; camera frames arrive base64-encoded (≈ 4/3 of the file)
+    MAX_CONTENT_LENGTH = MAX_UPLOAD_SIZE * 4 // 3 + 64 * 1024
     
     # ML
     MODEL_PATH = os.getenv('MODEL_PATH', './models/model.tflite')
     CONFIDENCE_THRESHOLD = float(os.getenv('CONFIDENCE_THRESHOLD', 0.5))
     DISTANCE_THRESHOLD_CM = int(os.getenv('DISTANCE_THRESHOLD_CM', 100))
 
+    # Cache (Flask-Caching) — shared Redis across workers when REDIS_URL is set
+    REDIS_URL = os.getenv('REDIS_URL')
+    CACHE_TYPE = 'RedisCache' if REDIS_URL else 'SimpleCache'
+    CACHE_REDIS_URL = REDIS_URL
+    CACHE_DEFAULT_TIMEOUT = int(os.getenv('CACHE_DEFAULT_TIMEOUT', 60))
+
+    # Response compression (Flask-Compress) — large /ml-history JSON lists
+    COMPRESS_ALGORITHM = ['br', 'gzip']
+    COMPRESS_MIN_SIZE = 1024
+    COMPRESS_BR_LEVEL = 4
+    COMPRESS_LEVEL = 6
+    COMPRESS_MIMETYPES = ['application/json']
+
+    # Logging — DEBUG messages are skipped (never formatted) at INFO and above
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+
     DEBUG = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
 
 class DevelopmentConfig(Config):
@@ -1,6 +1,9 @@
 from functools import wraps
 from flask import request, jsonify
 from app.utils.jwt_handler import decode_token
+import logging
+
+logger = logging.getLogger(__name__)
 
 def token_required(f):
     @wraps(f)
@@ -33,83 +36,47 @@ def token_required(f):
 def device_token_required(f):
     """
     Middleware to verify device token from X-Device-Token header
-    IMPROVED VERSION WITH EXTENSIVE LOGGING
     """
-    from functools import wraps
-    from flask import request, jsonify
     from app.services.supabase_client import get_supabase
     
     @wraps(f)
     def decorated(*args, **kwargs):
-        print(f"\n{'='*60}")
-        print(f"[DEVICE AUTH] Authenticating request to {request.path}")
-        print(f"{'='*60}")
-        
         # Check for token in header
         auth_header = request.headers.get('X-Device-Token', '')
-        print(f"📋 Headers received:")
-        for key, value in request.headers:
-            if key.lower() in ['x-device-token', 'authorization', 'content-type']:
-                if 'token' in key.lower():
-                    print(f"   {key}: {value[:20]}..." if len(value) > 20 else f"   {key}: {value}")
-                else:
-                    print(f"   {key}: {value}")
-        
         if not auth_header:
-            print(f"❌ [DEVICE AUTH] No X-Device-Token header found!")
+            logger.info("Device auth failed for %s: no X-Device-Token header", request.path)
             return jsonify({'error': 'Device token required'}), 401
         
         device_token = auth_header.replace('Bearer ', '').strip()
-        print(f"🔑 [DEVICE AUTH] Token received: {device_token[:20]}...")
         
         try:
             # Look up device by token
             supabase = get_supabase()
-            print(f"🔍 [DEVICE AUTH] Querying database for device with this token...")
-            
             response = supabase.table('user_devices')\
                 .select('*')\
                 .eq('device_token', device_token)\
                 .execute()
             
-            print(f"📊 [DEVICE AUTH] Query result: {len(response.data) if response.data else 0} devices found")
-            
             if not response.data or len(response.data) == 0:
-                print(f"❌ [DEVICE AUTH] No device found with this token!")
-                print(f"   Possible reasons:")
-                print(f"   - Token is invalid or expired")
-                print(f"   - Device was deleted from database")
-                print(f"   - Token doesn't match any device_token in user_devices table")
+                logger.info("Device auth failed for %s: unknown device token", request.path)
                 return jsonify({'error': 'Invalid device token'}), 401
             
             device = response.data[0]
-            print(f"✅ [DEVICE AUTH] Device found!")
-            print(f"   Device ID: {device['id']}")
-            print(f"   Device Name: {device.get('device_name', 'Unknown')}")
-            print(f"   Status: {device.get('status', 'Unknown')}")
-            print(f"   User ID: {device.get('user_id', 'Unknown')}")
             
-            # Check if device is active
+            # Inactive devices are let through, but flagged
             if device.get('status') != 'active':
-                print(f"⚠️  [DEVICE AUTH] Device is not active (status: {device.get('status')})")
-                print(f"   Allowing anyway, but device should be activated")
+                logger.warning("Device %s is not active (status: %s)",
+                               device['id'], device.get('status'))
             
             # Set device in request context
             request.current_device = device
-            print(f"✅ [DEVICE AUTH] Authentication successful!")
-            print(f"   request.current_device set to: {device['id']}")
-            print(f"{'='*60}\n")
+            logger.debug("Device %s authenticated for %s", device['id'], request.path)
             
             # Call the actual route handler
             return f(*args, **kwargs)
             
-        except Exception as e:
-            print(f"❌ [DEVICE AUTH] Error during authentication!")
-            print(f"   Error type: {type(e).__name__}")
-            print(f"   Error message: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            print(f"{'='*60}\n")
+        except Exception:
+            logger.exception("Device authentication error for %s", request.path)
             return jsonify({'error': 'Authentication failed'}), 500
     
     return decorated
@@ -7,6 +7,9 @@ from app.services.supabase_client import get_supabase, get_admin_client
 from app.middleware.auth import token_required, admin_required
 from app.utils.timezone_helper import now_ph, now_ph_iso
 from datetime import timedelta
+import logging
+
+logger = logging.getLogger(__name__)
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 
@@ -89,17 +92,16 @@ def get_system_health():
             'mlModels':      ml_models,
         }), 200
 
-    except Exception as e:
-        print(f"[Admin Health] Error: {e}")
-        import traceback; traceback.print_exc()
+    except Exception:
+        logger.exception("[Admin Health] Error")
         return jsonify({'error': 'Failed to get system health'}), 500
 
 
 def _ping_service(url, timeout=10, expect_401=False):
     try:
-        start = time.time()
+        start = time.perf_counter_ns()
         resp  = http_requests.get(url, timeout=timeout)
-        ms    = int((time.time() - start) * 1000)
+        ms    = (time.perf_counter_ns() - start) // 1_000_000
         ok    = resp.status_code < 500 or (expect_401 and resp.status_code == 401)
         return {'status': 'ok' if ok else 'error', 'latencyMs': ms, 'code': resp.status_code}
     except http_requests.exceptions.Timeout:
@@ -182,9 +184,8 @@ def get_all_detections():
             'offset':     offset,
         }), 200
 
-    except Exception as e:
-        print(f"[Admin Detections] Error: {e}")
-        import traceback; traceback.print_exc()
+    except Exception:
+        logger.exception("[Admin Detections] Error")
         return jsonify({'error': 'Failed to get detections'}), 500
 
 
@@ -195,10 +196,10 @@ def get_detection_stats():
     try:
         supabase = get_admin_client()
 
-        total_res  = supabase.table('detection_logs').select('*', count='exact', head=True).execute()
-        high_res   = supabase.table('detection_logs').select('*', count='exact', head=True).eq('danger_level', 'High').execute()
-        medium_res = supabase.table('detection_logs').select('*', count='exact', head=True).eq('danger_level', 'Medium').execute()
-        low_res    = supabase.table('detection_logs').select('*', count='exact', head=True).eq('danger_level', 'Low').execute()
+        total_res  = supabase.table('detection_logs').select('id', count='exact', head=True).execute()
+        high_res   = supabase.table('detection_logs').select('id', count='exact', head=True).eq('danger_level', 'High').execute()
+        medium_res = supabase.table('detection_logs').select('id', count='exact', head=True).eq('danger_level', 'Medium').execute()
+        low_res    = supabase.table('detection_logs').select('id', count='exact', head=True).eq('danger_level', 'Low').execute()
 
         return jsonify({
             'total':  total_res.count  or 0,
@@ -207,9 +208,8 @@ def get_detection_stats():
             'low':    low_res.count    or 0,
         }), 200
 
-    except Exception as e:
-        print(f"[Admin DetectionStats] Error: {e}")
-        import traceback; traceback.print_exc()
+    except Exception:
+        logger.exception("[Admin DetectionStats] Error")
         return jsonify({'error': 'Failed to get detection stats'}), 500
 
 
@@ -233,7 +233,7 @@ def get_ml_analytics():
 
         # ── Total ML predictions ──────────────────────────────────────────────
         ml_total_res      = supabase.table('ml_predictions')\
-            .select('*', count='exact', head=True)\
+            .select('id', count='exact', head=True)\
             .gte('created_at', start_iso).execute()
         total_predictions = ml_total_res.count or 0
 
@@ -338,9 +338,8 @@ def get_ml_analytics():
             },
         }), 200
 
-    except Exception as e:
-        print(f"[Admin Analytics] Error: {e}")
-        import traceback; traceback.print_exc()
+    except Exception:
+        logger.exception("[Admin Analytics] Error")
         return jsonify({'error': 'Failed to get analytics'}), 500
 
 
@@ -380,9 +379,8 @@ def get_all_users():
 
         return jsonify({'users': users, 'total': len(users)}), 200
 
-    except Exception as e:
-        print(f"[Admin Users] Error: {e}")
-        import traceback; traceback.print_exc()
+    except Exception:
+        logger.exception("[Admin Users] Error")
         return jsonify({'error': 'Failed to get users'}), 500
 
 
@@ -422,9 +420,8 @@ def get_user_detections(user_id):
             'total':      len(detections),
         }), 200
 
-    except Exception as e:
-        print(f"[Admin UserDetections] Error: {e}")
-        import traceback; traceback.print_exc()
+    except Exception:
+        logger.exception("[Admin UserDetections] Error")
         return jsonify({'error': 'Failed to get user detections'}), 500
 
 
@@ -457,9 +454,8 @@ def toggle_device_status(device_id):
             'new_status': new_status,
         }), 200
 
-    except Exception as e:
-        print(f"[Admin ToggleDevice] Error: {e}")
-        import traceback; traceback.print_exc()
+    except Exception:
+        logger.exception("[Admin ToggleDevice] Error")
         return jsonify({'error': 'Failed to update device status'}), 500
 
 
@@ -499,7 +495,6 @@ def get_live_feed():
             'timestamp':  now_ph_iso(),
         }), 200
 
-    except Exception as e:
-        print(f"[Admin LiveFeed] Error: {e}")
-        import traceback; traceback.print_exc()
+    except Exception:
+        logger.exception("[Admin LiveFeed] Error")
         return jsonify({'error': 'Failed to get live feed'}), 500
\ No newline at end of file
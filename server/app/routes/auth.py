@@ -8,10 +8,12 @@ from app.services.email_service import (
 from app.utils.jwt_handler import generate_token
 from app.middleware.auth import token_required
 import bcrypt
-import traceback
+import logging
 from datetime import datetime, timedelta
 from app.utils.timezone_helper import now_ph, now_ph_iso, PH_TIMEZONE
 
+logger = logging.getLogger(__name__)
+
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
 # ============================================
@@ -32,8 +34,7 @@ def test_db():
             'users': response.data
         }), 200
     except Exception as e:
-        print(f"Test DB error: {str(e)}")
-        traceback.print_exc()
+        logger.exception("Test DB error")
         return jsonify({'error': str(e)}), 500
 
 @auth_bp.route('/me', methods=['GET', 'OPTIONS'])
@@ -53,9 +54,8 @@ def get_current_user():
         
         return jsonify({'user': response.data[0]}), 200
         
-    except Exception as e:
-        print(f"Get user error: {str(e)}")
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Get user error")
         return jsonify({'error': 'Failed to get user info'}), 500
 
 @auth_bp.route('/logout', methods=['POST'])
@@ -93,9 +93,8 @@ def logout():
 
         return jsonify({'message': 'Logged out successfully'}), 200
 
-    except Exception as e:
-        print(f"Logout error: {str(e)}")
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Logout error")
         return jsonify({'message': 'Logged out successfully'}), 200
 
 # ============================================
@@ -169,10 +168,8 @@ def register():
             'message': 'Registration successful! Please check your email to verify your account.'
         }), 201
         
-    except Exception as e:
-        print(f"Registration error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Registration error")
         return jsonify({'error': 'Registration failed'}), 500
 
 # ============================================
@@ -210,9 +207,8 @@ def verify_email():
         
         return jsonify({'message': 'Email verified successfully! You can now login.'}), 200
         
-    except Exception as e:
-        print(f"Email verification error: {str(e)}")
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Email verification error")
         return jsonify({'error': 'Verification failed'}), 500
 
 @auth_bp.route('/resend-verification', methods=['POST'])
@@ -265,10 +261,8 @@ def resend_verification():
         
         return jsonify({'message': 'Verification email sent! Please check your inbox.'}), 200
         
-    except Exception as e:
-        print(f"Resend verification error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Resend verification error")
         return jsonify({'error': 'Failed to resend verification email'}), 500
 
 # ============================================
@@ -311,7 +305,7 @@ def login():
         
         # Update last login
         supabase.table('users').update({
-            'last_login': 'now()'
+            'last_login': now_ph_iso()
         }).eq('id', user['id']).execute()
         
         # Generate JWT token
@@ -334,9 +328,8 @@ def login():
             }
         }), 200
         
-    except Exception as e:
-        print(f"Login error: {str(e)}")
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Login error")
         return jsonify({'error': 'Login failed'}), 500
 
 # ============================================
@@ -380,22 +373,15 @@ def forgot_password():
             print("📧 Attempting to send password reset email...")
             send_password_reset_email(email, user_data['username'], reset_token)
             print(f"✅ Email sent successfully!")
-        except Exception as email_error:
-            print(f"="*60)
-            print(f"❌ EMAIL SENDING FAILED!")
-            print(f"Error: {str(email_error)}")
-            import traceback
-            traceback.print_exc()
-            print(f"="*60)
+        except Exception:
+            logger.exception("Password reset email sending failed")
         
         return jsonify({
             'message': 'If the email exists, a password reset link has been sent'
         }), 200
         
-    except Exception as e:
-        print(f"❌ Forgot password error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Forgot password error")
         return jsonify({
             'error': 'Unable to process request. Please try again later.'
         }), 500
@@ -458,10 +444,8 @@ def reset_password():
             'message': 'Password reset successful! You can now login with your new password.'
         }), 200
         
-    except Exception as e:
-        print(f"❌ Password reset error: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Password reset error")
         return jsonify({'error': 'Failed to reset password'}), 500
 
 
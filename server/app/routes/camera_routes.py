@@ -5,10 +5,14 @@ Camera Routes - Snapshot upload and retrieval
 from flask import Blueprint, request, jsonify
 import base64
 import os
+import requests
 from datetime import datetime
 from app.services.supabase_client import get_supabase
 from app.middleware.auth import token_required
 from app.utils.timezone_helper import now_ph, now_ph_iso
+import logging
+
+logger = logging.getLogger(__name__)
 
 camera_bp = Blueprint('camera', __name__, url_prefix='/api/camera')
 
@@ -17,6 +21,11 @@ SUPABASE_URL = os.getenv('SUPABASE_URL', '').rstrip('/')
 SUPABASE_SERVICE_KEY = os.getenv('SUPABASE_SERVICE_KEY', '')
 SNAPSHOT_BUCKET = 'camera'
 
+# One pooled keep-alive session for Storage uploads — the Pi posts a frame
+# every few seconds, so reusing the TLS connection saves a handshake each time
+_storage = requests.Session()
+_storage.headers['Authorization'] = f'Bearer {SUPABASE_SERVICE_KEY}'
+
 
 @camera_bp.route('/upload', methods=['POST'])
 def upload_snapshot():
@@ -61,14 +70,12 @@ def upload_snapshot():
         
         try:
             # Use Supabase Storage API
-            import requests
             upload_url = f"{SUPABASE_URL}/storage/v1/object/{SNAPSHOT_BUCKET}/{file_path}"
             
-            upload_response = requests.put(
+            upload_response = _storage.put(
                 upload_url,
                 data=jpeg_bytes,
                 headers={
-                    'Authorization': f'Bearer {SUPABASE_SERVICE_KEY}',
                     'Content-Type': 'image/jpeg',
                     'x-upsert': 'true'
                 },
@@ -100,10 +107,8 @@ def upload_snapshot():
             'url': public_url
         }), 200
         
-    except Exception as e:
-        print(f"Upload snapshot error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Upload snapshot error")
         return jsonify({'error': 'Failed to upload snapshot'}), 500
 
 
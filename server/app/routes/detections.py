@@ -7,21 +7,72 @@ from app.constants.detection_categories import (
     get_alert_type_from_object,
     DETECTION_CATEGORIES,
 )
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from app.utils.timezone_helper import now_ph, now_ph_iso, PH_TIMEZONE, utc_to_ph
 import base64
+import threading
 import uuid
 import csv
 from io import StringIO, BytesIO
+import logging
+
+logger = logging.getLogger(__name__)
 
 detections_bp = Blueprint('detections', __name__, url_prefix='/api/detections')
 
 # Max pages × 1000 rows = 5000 — safely covers all sensor/camera logs
 _MAX_PAGES = 5
 
+# Post-insert bookkeeping (last_seen, stats, device status) runs off the
+# request thread — the device only needs the inserted detection back. One
+# worker keeps the writes in arrival order, as when they ran inline.
+# At most _BACKGROUND_MAX_PENDING jobs wait in the executor's queue; past
+# that the request does the writes itself, so a burst slows the device
+# down instead of growing the queue without limit.
+_BACKGROUND_MAX_PENDING = 200
+
+_background       = ThreadPoolExecutor(max_workers=1, thread_name_prefix='detections-bg')
+_background_slots = threading.BoundedSemaphore(_BACKGROUND_MAX_PENDING)
+
 
 # ── Shared helpers ─────────────────────────────────────────────────────────────
 
+def _post_detection_updates(supabase, device_id, user_id, object_detected,
+                            detection_log, detected_at):
+    """Best-effort writes that follow a detection insert (runs on _background)."""
+    try:
+        supabase.table('user_devices')\
+            .update({'last_seen': now_ph_iso()})\
+            .eq('id', device_id).execute()
+    except Exception as e:
+        logger.warning("last_seen update failed for %s (non-critical): %s", device_id, e)
+
+    _update_user_statistics_safe(user_id, object_detected, detected_at)
+    _update_device_status_safe(device_id, detection_log, detected_at)
+
+
+def _schedule_post_detection_updates(*args):
+    """Queue _post_detection_updates on _background, or run it inline when full."""
+    if not _background_slots.acquire(blocking=False):
+        logger.warning("Detection follow-up queue full — running inline")
+        _post_detection_updates(*args)
+        return
+
+    def run():
+        try:
+            _post_detection_updates(*args)
+        finally:
+            _background_slots.release()
+
+    try:
+        _background.submit(run)
+    except RuntimeError:
+        # Executor shut down (interpreter exit)
+        _background_slots.release()
+        _post_detection_updates(*args)
+
+
 def _get_user_device(supabase, user_id):
     """Return first device ID for user, or None."""
     result = supabase.table('user_devices').select('id').eq('user_id', user_id).limit(1).execute()
@@ -73,7 +124,7 @@ def get_detections():
             return jsonify({'data': [], 'count': 0, 'limit': limit, 'offset': offset}), 200
 
         total = supabase.table('detection_logs')\
-            .select('*', count='exact', head=True)\
+            .select('id', count='exact', head=True)\
             .eq('device_id', device_id).execute().count
 
         rows = supabase.table('detection_logs')\
@@ -269,16 +320,15 @@ def log_detection():
         supabase = get_admin_client()
 
         # Resolve user_id from device
-        print(f"🔍 Looking up user for device: {device_id}")
         device_row = supabase.table('user_devices')\
             .select('user_id').eq('id', device_id).single().execute()
 
         if not device_row.data or not device_row.data.get('user_id'):
-            print("❌ Device has no user_id!")
+            logger.warning("Detection from unpaired device %s", device_id)
             return jsonify({'error': 'Device not paired to a user'}), 403
 
         user_id = device_row.data['user_id']
-        print(f"✅ Detection from device {device_id} (user: {user_id})")
+        logger.debug("Detection from device %s (user: %s)", device_id, user_id)
 
         # ── Parse incoming fields (support both snake_case and camelCase) ─────
         def field(*keys, default=None):
@@ -323,9 +373,9 @@ def log_detection():
         if raw_image:
             try:
                 image_url = _upload_image_to_supabase(device_id, raw_image)
-                print(f"✅ Image uploaded: {image_url}")
+                logger.debug("Image uploaded: %s", image_url)
             except Exception as img_err:
-                print(f"⚠️ Image upload failed: {img_err}")
+                logger.warning("Image upload failed: %s", img_err)
 
         detected_at = now_ph_iso()
 
@@ -354,40 +404,25 @@ def log_detection():
         if image_url:
             detection_log['image_url'] = str(image_url)
 
-        print(f"📝 Inserting detection: {object_detected} at {parsed_distance}cm")
+        logger.debug("Inserting detection: %s at %scm", object_detected, parsed_distance)
 
         # ── DB insert ─────────────────────────────────────────────────────────
         try:
             response = supabase.table('detection_logs').insert(detection_log).execute()
             if not response.data:
-                print("❌ Insert returned no data")
+                logger.error("Detection insert returned no data")
                 return jsonify({'error': 'Insert failed'}), 500
             detection_id = response.data[0]['id']
-            print(f"✅ Detection logged! ID: {detection_id}")
+            logger.debug("Detection logged: %s", detection_id)
         except Exception as db_err:
-            print(f"❌ Database insert failed: {db_err}")
-            import traceback; traceback.print_exc()
+            logger.exception("Database insert failed")
             return jsonify({'error': 'Database insert failed', 'details': str(db_err)}), 500
 
-        # ── Update last_seen ──────────────────────────────────────────────────
-        try:
-            supabase.table('user_devices')\
-                .update({'last_seen': now_ph_iso()})\
-                .eq('id', device_id).execute()
-            print("   ✅ last_seen updated")
-        except Exception as e:
-            print(f"   ⚠️ last_seen update failed (non-critical): {e}")
-
-        # ── Update statistics (non-critical) ──────────────────────────────────
-        try:
-            _update_user_statistics_safe(user_id, object_detected, detected_at)
-        except Exception as e:
-            print(f"⚠️ Statistics update failed (non-critical): {e}")
-
-        try:
-            _update_device_status_safe(device_id, detection_log, detected_at)
-        except Exception as e:
-            print(f"⚠️ Device status update failed (non-critical): {e}")
+        # ── Non-critical follow-ups run off the request thread ────────────────
+        _schedule_post_detection_updates(
+            supabase, device_id, user_id,
+            object_detected, detection_log, detected_at,
+        )
 
         return jsonify({
             'message':      'Detection logged successfully',
@@ -399,8 +434,7 @@ def log_detection():
         }), 201
 
     except Exception as e:
-        print(f"❌ Error: {e}")
-        import traceback; traceback.print_exc()
+        logger.exception("Detection logging failed")
         return jsonify({'error': str(e)}), 500
 
 
@@ -420,44 +454,19 @@ def _update_user_statistics_safe(user_id, object_detected, detected_at):
         am_pm      = 'AM' if hour < 12 else 'PM'
         hour_range = f"{hour_12}{am_pm}"
 
-        def upsert_counter(table, match_fields, count_field='total_alerts'):
-            """Increment counter or insert new row."""
-            q = supabase.table(table).select(f'id, {count_field}')
-            for col, val in match_fields.items():
-                q = q.eq(col, val)
-            existing = q.limit(1).execute()
-            if existing.data:
-                new_count = existing.data[0][count_field] + 1
-                supabase.table(table)\
-                    .update({count_field: new_count, 'updated_at': detected_at})\
-                    .eq('id', existing.data[0]['id']).execute()
-            else:
-                supabase.table(table).insert({
-                    **match_fields,
-                    count_field: 1,
-                    'created_at': detected_at,
-                }).execute()
-
-        try:
-            upsert_counter('daily_statistics',   {'user_id': user_id, 'stat_date': stat_date},       'total_alerts')
-            print(f"   ✅ Daily stats updated ({stat_date})")
-        except Exception as e:
-            print(f"   ⚠️ Daily stats update failed: {e}")
-
-        try:
-            upsert_counter('obstacle_statistics', {'user_id': user_id, 'obstacle_type': object_detected}, 'total_count')
-            print(f"   ✅ Obstacle stats updated ({object_detected})")
-        except Exception as e:
-            print(f"   ⚠️ Obstacle stats update failed: {e}")
-
-        try:
-            upsert_counter('hourly_patterns',     {'user_id': user_id, 'hour_range': hour_range},    'detection_count')
-            print(f"   ✅ Hourly pattern updated ({hour_range})")
-        except Exception as e:
-            print(f"   ⚠️ Hourly pattern update failed: {e}")
+        # One upsert per table (migrations/012): concurrent detections can't
+        # lose increments or duplicate a first row. All three counters
+        # commit or fail together.
+        supabase.rpc('bump_user_statistics', {
+            'p_user_id':       str(user_id),
+            'p_stat_date':     stat_date,
+            'p_obstacle_type': str(object_detected),
+            'p_hour_range':    hour_range,
+            'p_at':            detected_at,
+        }).execute()
 
     except Exception as e:
-        print(f"⚠️ Statistics update error (non-critical): {e}")
+        logger.warning("Statistics update failed for %s (non-critical): %s", user_id, e)
 
 
 def _update_device_status_safe(device_id, detection_log, detected_at):
@@ -474,8 +483,13 @@ def _update_device_status_safe(device_id, detection_log, detected_at):
         }
 
         if status_check.data:
+            # Never let an older detection overwrite a newer one (another
+            # gunicorn worker may be writing this device's status too)
             supabase.table('device_status')\
-                .update(update).eq('id', status_check.data[0]['id']).execute()
+                .update(update)\
+                .eq('id', status_check.data[0]['id'])\
+                .or_(f'last_detection_time.is.null,last_detection_time.lt."{detected_at}"')\
+                .execute()
         else:
             supabase.table('device_status').insert({
                 **update,
@@ -486,7 +500,7 @@ def _update_device_status_safe(device_id, detection_log, detected_at):
             }).execute()
 
     except Exception as e:
-        print(f"⚠️ Device status update error (non-critical): {e}")
+        logger.warning("Device status update failed for %s (non-critical): %s", device_id, e)
 
 
 # ── Export helpers ────────────────────────────────────────────────────────────
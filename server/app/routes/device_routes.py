@@ -1,11 +1,11 @@
 from flask import Blueprint, current_app, request, jsonify
-from app.services.supabase_client import get_supabase
+import logging
+from app.services.prediction_writer import prediction_writer
 from datetime import datetime
 from app.utils.timezone_helper import now_ph, now_ph_iso, PH_TIMEZONE
 
 device_bp = Blueprint('device', __name__, url_prefix='/api/device')
-
-print("✅ device_routes.py loaded successfully!")
+logger = logging.getLogger(__name__)
 
 
 def _detect_anomaly_rules(telemetry: dict) -> dict:
@@ -77,9 +77,7 @@ def receive_telemetry():
     """
     try:
         data = request.get_json()
-        print(f"\n📡 [TELEMETRY] Received data from device")
-        print(f"   Device ID: {data.get('device_id')}")
-        print(f"   Data: {data}")
+        logger.debug("Telemetry received: %s", data)
 
         if not data:
             return jsonify({'error': 'No data provided'}), 400
@@ -88,11 +86,9 @@ def receive_telemetry():
         if not device_id:
             return jsonify({'error': 'device_id is required'}), 400
 
-        supabase = get_supabase()
         results = {}
 
         # ========== ANOMALY DETECTION ==========
-        print(f"\n🔍 [ANOMALY] Running rule-based anomaly detection...")
         try:
             telemetry = {
                 'temperature':      data.get('temperature', 37.0),
@@ -104,8 +100,7 @@ def receive_telemetry():
 
             anomaly_result = _detect_anomaly_rules(telemetry)
             results['anomaly'] = anomaly_result
-
-            print(f"   Result: {anomaly_result}")
+            logger.debug("Anomaly result for %s: %s", device_id, anomaly_result)
 
             prediction = {
                 'device_id':        device_id,
@@ -118,22 +113,13 @@ def receive_telemetry():
                 'model_version':    'rules-v1.0'
             }
 
-            print(f"💾 [ANOMALY] Saving to database...")
-            db_result = supabase.table('ml_predictions').insert(prediction).execute()
-
-            if db_result.data:
-                print(f"✅ [ANOMALY] Saved! ID: {db_result.data[0].get('id')}")
-            else:
-                print(f"⚠️ [ANOMALY] No data returned from insert")
+            # Written in bulk by a background thread — no DB round-trip here
+            prediction_writer.enqueue(prediction)
 
         except Exception as e:
-            print(f"❌ [ANOMALY] Error: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Anomaly detection failed for %s", device_id)
             results['anomaly'] = {'error': str(e)}
 
-        print(f"\n✅ Telemetry processed successfully for device {device_id}\n")
-
         return jsonify({
             'success':     True,
             'message':     'Telemetry received and processed',
@@ -143,9 +129,7 @@ def receive_telemetry():
         }), 200
 
     except Exception as e:
-        print(f"\n❌ [TELEMETRY] Error processing telemetry: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Telemetry processing failed")
         return jsonify({
             'success': False,
             'error':   'Failed to process telemetry',
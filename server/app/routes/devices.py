@@ -1,11 +1,16 @@
 from flask import Blueprint, request, jsonify
 from app.services.supabase_client import get_supabase
+from app.services.cache import invalidate_user_device_ids
+from app.routes.settings import invalidate_device_token
 from app.middleware.auth import token_required, device_token_required, admin_required, check_permission
 from app.utils.jwt_handler import generate_device_token
 import secrets
 import string
 from datetime import datetime, timedelta
 from app.utils.timezone_helper import now_ph, now_ph_iso, PH_TIMEZONE, utc_to_ph
+import logging
+
+logger = logging.getLogger(__name__)
 
 devices_bp = Blueprint('devices', __name__, url_prefix='/api/devices')
 
@@ -31,7 +36,7 @@ def register_device():
         
         # Check device limit (max 1 device per user)
         existing = supabase.table('user_devices')\
-            .select('*', count='exact')\
+            .select('id', count='exact', head=True)\
             .eq('user_id', user_id)\
             .execute()
         
@@ -56,6 +61,7 @@ def register_device():
             return jsonify({'error': 'Failed to register device'}), 500
         
         device = response.data[0]
+        invalidate_user_device_ids(user_id)
         
         # Log activity
         supabase.table('activity_logs').insert({
@@ -76,10 +82,8 @@ def register_device():
             }
         }), 201
         
-    except Exception as e:
-        print(f"Register device error: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Register device error")
         return jsonify({'error': 'Failed to register device'}), 500
     
 @devices_bp.route('/complete-pairing', methods=['POST'])
@@ -94,7 +98,7 @@ def complete_pairing():
         pairing_code = data.get('pairingCode')
         device_id = data.get('deviceId')
         
-        print(f"Complete pairing request: deviceId={device_id}, code={pairing_code}")
+        logger.debug("Complete pairing request for device %s", device_id)
         
         if not pairing_code:
             return jsonify({'error': 'Pairing code required'}), 400
@@ -129,15 +133,14 @@ def complete_pairing():
             if time_diff > timedelta(hours=1):
                 return jsonify({'error': 'Pairing code expired. Please register a new device.'}), 400
         except Exception as date_error:
-            print(f"Date parsing error: {date_error}")
-            print("Warning: Could not verify code expiration")
+            logger.warning("Could not verify pairing code expiration: %s", date_error)
         
         # FIX: was 'now()' raw SQL string — use now_ph_iso() instead
         supabase.table('user_devices').update({
             'updated_at': now_ph_iso()
         }).eq('id', device_id).execute()
         
-        print(f"✅ Pairing code verified for device {device_id}")
+        logger.info("Pairing code verified for device %s", device_id)
         
         return jsonify({
             'success': True,
@@ -145,9 +148,7 @@ def complete_pairing():
         }), 200
         
     except Exception as e:
-        print(f"❌ Complete pairing error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Complete pairing error")
         return jsonify({'error': f'Failed to complete pairing: {str(e)}'}), 500
     
 @devices_bp.route('/pair-status-by-code/<pairing_code>', methods=['GET'])
@@ -196,10 +197,8 @@ def check_pair_status_by_code(pairing_code):
             'message': 'Pairing code is valid'
         }), 200
         
-    except Exception as e:
-        print(f"Pair status check error: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Pair status check error")
         return jsonify({'error': 'Failed to check pairing status'}), 500
 
 @devices_bp.route('/<device_id>', methods=['PUT'])
@@ -239,14 +238,15 @@ def update_device(device_id):
             .update(update_data)\
             .eq('id', device_id)\
             .execute()
+        invalidate_user_device_ids(device.data['user_id'])
         
         return jsonify({
             'message': 'Device updated successfully',
             'data': response.data
         }), 200
         
-    except Exception as e:
-        print(f"Update device error: {e}")
+    except Exception:
+        logger.exception("Update device error")
         return jsonify({'error': 'Failed to update device'}), 500
 
 @devices_bp.route('/pending-for-serial/<serial_number>', methods=['GET'])
@@ -289,10 +289,8 @@ def get_pending_for_serial(serial_number):
             'device_id': device['id']
         }), 200
         
-    except Exception as e:
-        print(f"Get pending error: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Get pending error")
         return jsonify({'error': 'Failed to check pending devices'}), 500
     
 # ============================================
@@ -336,10 +334,8 @@ def get_user_devices():
         
         return jsonify({'data': devices}), 200
         
-    except Exception as e:
-        print(f"Get devices error: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Get devices error")
         return jsonify({'error': 'Failed to get devices'}), 500
 
 
@@ -366,6 +362,8 @@ def delete_device(device_id):
             return jsonify({'error': 'Permission denied'}), 403
         
         supabase.table('user_devices').delete().eq('id', device_id).execute()
+        invalidate_user_device_ids(device.data['user_id'])
+        invalidate_device_token(device.data.get('device_token'))
         
         supabase.table('activity_logs').insert({
             'user_id': user_id,
@@ -375,8 +373,8 @@ def delete_device(device_id):
         
         return jsonify({'message': 'Device deleted successfully'}), 200
         
-    except Exception as e:
-        print(f"Delete device error: {e}")
+    except Exception:
+        logger.exception("Delete device error")
         return jsonify({'error': 'Failed to delete device'}), 500
 
 @devices_bp.route('/<device_id>/regenerate-token', methods=['POST'])
@@ -412,14 +410,15 @@ def regenerate_device_token(device_id):
             })\
             .eq('id', device_id)\
             .execute()
+        invalidate_device_token(device.data.get('device_token'))
         
         return jsonify({
             'message': 'Token regenerated successfully',
             'token': new_token
         }), 200
         
-    except Exception as e:
-        print(f"Regenerate token error: {e}")
+    except Exception:
+        logger.exception("Regenerate token error")
         return jsonify({'error': 'Failed to regenerate token'}), 500
 
 # ============================================
@@ -454,9 +453,8 @@ def get_device_status():
             time_diff = now_ph() - last_seen_time
             device_online = time_diff.total_seconds() < 120
             
-            print(f"📊 Device last seen: {last_seen}")
-            print(f"⏰ Time since last seen: {time_diff.total_seconds():.0f}s")
-            print(f"🔌 Device online: {device_online}")
+            logger.debug("Device last seen %s (%.0fs ago, online=%s)",
+                         last_seen, time_diff.total_seconds(), device_online)
         
         recent_detection = supabase.table('detection_logs')\
             .select('obstacle_type, detected_at')\
@@ -484,10 +482,8 @@ def get_device_status():
             'lastDetectionTime': last_detection_time
         }), 200
         
-    except Exception as e:
-        print(f"❌ Error getting device status: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Error getting device status")
         return jsonify({'error': 'Failed to get device status'}), 500
 
 @devices_bp.route('/status', methods=['POST'])
@@ -498,8 +494,7 @@ def update_device_status():
         device_id = request.current_device['id']
         data = request.get_json()
         
-        print(f"📊 [POST /status] Update from device: {device_id}")
-        print(f"   Payload: {data}")
+        logger.debug("Status update from device %s: %s", device_id, data)
         
         if not data:
             return jsonify({'error': 'No data provided'}), 400
@@ -520,10 +515,8 @@ def update_device_status():
         
         if 'batteryLevel' in data:
             update_data['battery_level'] = data['batteryLevel']
-            print(f"   Battery: {data['batteryLevel']}%")
         elif 'battery_level' in data:
             update_data['battery_level'] = data['battery_level']
-            print(f"   Battery: {data['battery_level']}%")
         
         if 'lastObstacle' in data:
             update_data['last_obstacle'] = data['lastObstacle']
@@ -538,9 +531,8 @@ def update_device_status():
                 })\
                 .eq('id', device_id)\
                 .execute()
-            print(f"   ✅ Updated user_devices.last_seen")
         except Exception as e:
-            print(f"   ⚠️ Failed to update user_devices: {e}")
+            logger.warning("Failed to update user_devices for %s: %s", device_id, e)
         
         existing = supabase.table('device_status')\
             .select('id')\
@@ -554,12 +546,8 @@ def update_device_status():
                 .update(update_data)\
                 .eq('id', status_id)\
                 .execute()
-            print(f"   ✅ Updated device_status (id: {status_id})")
         else:
             response = supabase.table('device_status').insert(update_data).execute()
-            print(f"   ✅ Created device_status entry")
-        
-        print(f"✅ [POST /status] Device status updated successfully")
         
         return jsonify({
             'success': True,
@@ -567,10 +555,8 @@ def update_device_status():
             'data': response.data
         }), 200
         
-    except Exception as e:
-        print(f"❌ [POST /status] Error: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Device status update failed")
         return jsonify({'error': 'Failed to update device status'}), 500
 
 # ============================================
@@ -628,10 +614,8 @@ def get_system_info():
             'osVersion':        info.get('os_version')
         }), 200
         
-    except Exception as e:
-        print(f"Get system info error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Get system info error")
         return jsonify({'error': 'Failed to get system info'}), 500
 
 @devices_bp.route('/system-info/temperature', methods=['POST'])
@@ -657,10 +641,8 @@ def update_temperature():
         
         return jsonify({'message': 'Temperature updated'}), 200
         
-    except Exception as e:
-        print(f"Update temperature error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Update temperature error")
         return jsonify({'error': 'Failed to update temperature'}), 500
     
 @devices_bp.route('/system-info', methods=['POST'])
@@ -715,10 +697,8 @@ def update_system_info():
             'data': response.data
         }), 200
         
-    except Exception as e:
-        print(f"Update system info error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Update system info error")
         return jsonify({'error': 'Failed to update system info'}), 500
     
 # ============================================
@@ -731,7 +711,7 @@ def check_rate_limit(ip_address, serial_number=None):
     one_minute_ago = (now_ph() - timedelta(minutes=1)).isoformat()
     
     ip_attempts = supabase.table('pairing_attempts')\
-        .select('*', count='exact')\
+        .select('id', count='exact', head=True)\
         .eq('ip_address', ip_address)\
         .gte('attempted_at', one_minute_ago)\
         .execute()
@@ -741,7 +721,7 @@ def check_rate_limit(ip_address, serial_number=None):
     
     if serial_number:
         serial_attempts = supabase.table('pairing_attempts')\
-            .select('*', count='exact')\
+            .select('id', count='exact', head=True)\
             .eq('serial_number', serial_number)\
             .gte('attempted_at', one_minute_ago)\
             .execute()
@@ -835,10 +815,8 @@ def pair_device():
             'device_name':   device['device_name']
         }), 200
         
-    except Exception as e:
-        print(f"Pairing error: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Pairing error")
         return jsonify({'error': 'Pairing failed'}), 500
 
 @devices_bp.route('/activate', methods=['POST'])
@@ -884,7 +862,7 @@ def activate_device():
             'session_expires_at':     None
         }).eq('id', device['id']).execute()
         
-        print(f"✅ Device activated: {device['device_name']} (Serial: {serial_number})")
+        logger.info("Device activated: %s (serial %s)", device['device_name'], serial_number)
         
         return jsonify({
             'success':      True,
@@ -893,10 +871,8 @@ def activate_device():
             'device_name':  device['device_name']
         }), 200
         
-    except Exception as e:
-        print(f"Activation error: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Activation error")
         return jsonify({'error': 'Activation failed'}), 500
 
 @devices_bp.route('/pair-status/<serial_number>', methods=['GET'])
@@ -933,6 +909,6 @@ def check_pair_status(serial_number):
                 'message': 'Pairing in progress...'
             }), 200
         
-    except Exception as e:
-        print(f"Pair status error: {e}")
+    except Exception:
+        logger.exception("Pair status error")
         return jsonify({'error': 'Failed to check status'}), 500
\ No newline at end of file
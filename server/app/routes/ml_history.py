@@ -1,19 +1,47 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify, make_response
 from app.services.supabase_client import get_supabase
+from app.services.cache import cache, get_user_devices, get_user_device_ids
 from app.middleware.auth import token_required
 from datetime import datetime, timedelta, timezone
-from collections import defaultdict
+from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import logging
 from app.utils.timezone_helper import now_ph, now_ph_iso, PH_TIMEZONE, utc_to_ph
 
 ml_history_bp = Blueprint('ml_history', __name__, url_prefix='/api/ml-history')
+logger = logging.getLogger(__name__)
+
+# Fan-out pool for independent Supabase queries within one request. The
+# work is network-bound (httpx releases the GIL), so threads overlap RTTs.
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='ml-history')
 
 # ── Shared helpers ────────────────────────────────────────────────────────────
 
-def _get_device_ids(supabase, user_id, user_role):
+def _get_device_ids(user_id, user_role):
     if user_role == 'admin':
         return None
-    result = supabase.table('user_devices').select('id').eq('user_id', user_id).execute()
-    return [d['id'] for d in result.data] or []
+    return get_user_device_ids(user_id)
+
+def _get_device_names(supabase, user_id, user_role, rows):
+    """
+    Resolve device_id → device_name in Python instead of a PostgREST
+    user_devices(...) embed, which plans as a LATERAL join per row and
+    defeats the ORDER BY created_at DESC LIMIT index scan.
+    Users hit the cached device map; admins do one IN query over the
+    distinct ids actually returned.
+    """
+    if user_role != 'admin':
+        return get_user_devices(user_id)
+    ids = list({r['device_id'] for r in rows if r.get('device_id')})
+    if not ids:
+        return {}
+    result = supabase.table('user_devices').select('id, device_name').in_('id', ids).execute()
+    return {d['id']: d['device_name'] for d in result.data}
+
+def _pgrst_quote(value):
+    """Double-quote a value for a PostgREST or=(...) filter (timestamps contain ':' and '.')."""
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
 
 def _apply_device_filter(query, device_ids, col='device_id'):
     if device_ids:
@@ -62,182 +90,346 @@ def _to_ph_iso(ts_str):
             dt_utc = dt_utc.replace(tzinfo=timezone.utc)
         return utc_to_ph(dt_utc).isoformat()
     except Exception as e:
-        print(f"[ml_history] _to_ph_iso failed for '{ts_str}': {e}")
+        logger.debug("_to_ph_iso failed for %r: %s", ts_str, e)
         return ts_str
 
 
+# ── /ml-history row builders ─────────────────────────────────────────────────
+# One builder per prediction_type, dispatched once per row. Every column is
+# present on ml_history_unified rows, so plain subscripts replace .get().
+
+def _ml_row(item, confidence, result):
+    return {
+        'id':               item['id'],
+        'device_id':        item['device_id'],
+        'device_name':      item['device_name'] or 'Unknown',
+        'prediction_type':  item['prediction_type'],
+        'is_anomaly':       item['is_anomaly'],
+        'confidence_score': confidence,
+        # FIX: convert UTC → PH time so timestamps align with detection_logs
+        'timestamp':        _to_ph_iso(item['created_at']),
+        'result':           result,
+        'source':           'ml_prediction',
+    }
+
+def _build_anomaly(item):
+    health  = _safe_float(item['device_health_score'], 0)
+    score   = _safe_float(item['anomaly_score'])
+    message = (
+        f"Device anomaly detected (health: {health:.1f}%)"
+        if item['is_anomaly']
+        else f"Device health: {health:.1f}%"
+    )
+    return _ml_row(item, _normalize_confidence(score), {
+        'score':               score,
+        'severity':            item['anomaly_severity'],
+        'device_health_score': health,
+        'message':             message,
+    })
+
+def _build_object_detection(item):
+    obj  = item['object_detected']
+    dist = item['distance_cm']
+    conf = item['detection_confidence']
+    return _ml_row(item, _normalize_confidence(conf), {
+        'object':       obj, 'obstacle_type': obj,
+        'distance':     dist, 'distance_cm':  dist,
+        'danger_level': item['danger_level'],
+        'confidence':   conf,
+    })
+
+def _build_danger_prediction(item):
+    score  = _safe_float(item['danger_score'], 0)
+    action = item['recommended_action']
+    return _ml_row(item, _normalize_confidence(score / 100) if score > 0 else None, {
+        'danger_score':       score,
+        'recommended_action': action,
+        'time_to_collision':  item['time_to_collision'],
+        'message':            f"{action} - Danger score: {score:.1f}",
+    })
+
+def _build_environment(item):
+    env   = item['environment_type']
+    light = item['lighting_condition']
+    return _ml_row(item, _normalize_confidence(item['detection_confidence']), {
+        'environment_type':   env,
+        'lighting_condition': light,
+        'complexity_level':   item['complexity_level'],
+        'message':            f"{env} - {light} lighting",
+    })
+
+def _build_other(item):
+    return _ml_row(item, None, {})
+
+def _build_detection_log(item):
+    dist = item['distance_cm']
+    return {
+        'id':               item['id'],
+        'device_id':        item['device_id'],
+        'device_name':      item['device_name'] or 'Unknown',
+        'prediction_type':  'detection',
+        'is_anomaly':       item['is_anomaly'],
+        'confidence_score': _normalize_confidence(item['detection_confidence']),
+        # detection_logs.detected_at is already PH time — no conversion needed
+        'timestamp':        item['ts'],
+        'result': {
+            'obstacle_type': item['obstacle_type'],
+            'distance':      dist,
+            'distance_cm':   dist,
+            'danger_level':  item['danger_level'],
+            'alert_type':    item['alert_type'],
+        },
+        'source': 'detection_log',
+    }
+
+# ── /anomalies row shapers: item → (severity, score, message) ───────────────
+
+def _shape_anomaly(item):
+    health = _safe_float(item['device_health_score'], 0)
+    return (
+        item['anomaly_severity'],
+        _normalize_confidence(item['anomaly_score']),
+        f"Device anomaly detected (health: {health:.1f}%)",
+    )
+
+def _shape_danger_anomaly(item):
+    raw_score = _safe_float(item['danger_score'], 0)
+    return (
+        'high' if raw_score > 70 else 'medium',
+        _normalize_confidence(raw_score / 100) if raw_score > 0 else None,
+        f"Danger detected - {item['recommended_action']} recommended",
+    )
+
+def _shape_object_anomaly(item):
+    obj = item['object_detected'] or 'object'
+    return (
+        (item['danger_level'] or 'low').lower(),
+        _normalize_confidence(item['detection_confidence']),
+        f"{obj.capitalize()} detected at {item['distance_cm']}cm",
+    )
+
+def _shape_other_anomaly(item):
+    return 'medium', None, 'Anomaly detected'
+
+_ANOMALY_SHAPERS = {
+    'anomaly':           _shape_anomaly,
+    'danger_prediction': _shape_danger_anomaly,
+    'object_detection':  _shape_object_anomaly,
+}
+
+
+# ?type= value → ml_predictions.prediction_type ('detection' is handled
+# separately: it spans object_detection and detection-log rows)
+_TYPE_MAP = {
+    'danger':      'danger_prediction',
+    'environment': 'environment_classification',
+    'anomaly':     'anomaly',
+}
+
+_HISTORY_BUILDERS = {
+    'anomaly':                    _build_anomaly,
+    'object_detection':           _build_object_detection,
+    'danger_prediction':          _build_danger_prediction,
+    'environment_classification': _build_environment,
+    'detection':                  _build_detection_log,   # detection_logs rows
+}
+
+# Rows built and serialized per batch of the /api/ml-history body
+_HISTORY_CHUNK = 250
+
+# Exactly the ml_history_unified columns the builders read (not `source`,
+# which they set themselves) — keeps the PostgREST payload to what is used.
+_HISTORY_COLUMNS = (
+    'id, device_id, device_name, prediction_type, is_anomaly, ts, created_at, '
+    'anomaly_score, anomaly_severity, device_health_score, '
+    'object_detected, distance_cm, danger_level, detection_confidence, '
+    'danger_score, recommended_action, time_to_collision, '
+    'environment_type, lighting_condition, complexity_level, '
+    'obstacle_type, alert_type'
+)
+
+
+def _data_version(supabase, device_ids):
+    """
+    Fingerprint of the caller's data: the newest ml_predictions and
+    detection_logs timestamps, from one ml_data_version RPC (migrations/008)
+    that does one index-backed LIMIT 1 probe per device — its cost doesn't
+    grow with the tables.
+    """
+    return supabase.rpc('ml_data_version', {'device_ids': device_ids}).execute().data
+
+
+def _etag_cached(f=None, *, bucket='%Y-%m-%d %H', cache_timeout=None):
+    """
+    Conditional GET for the polled dashboard endpoints. The ETag covers the
+    request URL, the caller and the data version, so an unchanged poll gets
+    a header-only 304 and skips the endpoint's queries entirely.
+
+    `bucket` is the PH-time strftime that also rotates the ETag — use a
+    finer one for endpoints that read data refreshed out of band.
+    `cache_timeout` also stores the 200 body in the shared cache under the
+    ETag, so other tabs/workers asking for the same data version reuse it.
+    """
+    if f is None:
+        return lambda fn: _etag_cached(fn, bucket=bucket, cache_timeout=cache_timeout)
+
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        try:
+            user       = request.current_user
+            device_ids = _get_device_ids(user['user_id'], user['role'])
+            if device_ids == []:
+                return f(*args, **kwargs)
+
+            version = _data_version(get_supabase(), device_ids)
+            # Rolling `days` windows shift without new rows — bucket by PH hour
+            # device_ids too: removing a device drops its rows without a
+            # newer timestamp appearing
+            key  = repr((request.full_path, user['user_id'], user['role'],
+                         device_ids, version, now_ph().strftime(bucket)))
+            etag = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+        except Exception as e:
+            logger.warning("ETag computation failed: %s", e)
+            return f(*args, **kwargs)
+
+        if request.if_none_match.contains_weak(etag):
+            response = make_response('', 304)
+            response.set_etag(etag, weak=True)
+            return response
+
+        cache_key = f"ml_history:body:{etag}"
+        body = cache.get(cache_key) if cache_timeout else None
+        if body is not None:
+            response = current_app.response_class(body, mimetype='application/json')
+        else:
+            response = make_response(f(*args, **kwargs))
+            if cache_timeout and response.status_code == 200 and not response.is_streamed:
+                cache.set(cache_key, response.get_data(), timeout=cache_timeout)
+
+        if response.status_code == 200:
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = 'private, must-revalidate'
+        return response
+
+    return decorated
+
+
 # ── GET /api/ml-history ───────────────────────────────────────────────────────
 
 @ml_history_bp.route('', methods=['GET'])
 @token_required
+@_etag_cached
 def get_ml_history():
     try:
         user_id   = request.current_user['user_id']
         user_role = request.current_user['role']
 
-        limit      = min(request.args.get('limit', 1000, type=int), 1000)
+        limit      = max(1, min(request.args.get('limit', 1000, type=int), 1000))
         offset     = request.args.get('offset', 0, type=int)
         pred_type  = request.args.get('type')
         source     = request.args.get('source', 'all')
         anom_only  = request.args.get('anomalies_only', 'false').lower() == 'true'
         start_date = request.args.get('start_date')
         end_date   = request.args.get('end_date')
+        # Keyset cursor (next_cursor of the previous page). Preferred over
+        # `offset`, which is kept for older clients but re-scans skipped rows.
+        cursor_ts  = request.args.get('cursor_ts')
+        cursor_id  = request.args.get('cursor_id')
+        use_cursor = bool(cursor_ts and cursor_id)
+        want_total = request.args.get('include_total', 'false').lower() == 'true'
 
         supabase   = get_supabase()
-        device_ids = _get_device_ids(supabase, user_id, user_role)
+        device_ids = _get_device_ids(user_id, user_role)
 
         if device_ids == []:
             return jsonify({'data': [], 'total': 0, 'limit': limit, 'offset': offset}), 200
 
-        combined = []
+        if source not in ('all', 'predictions', 'detections'):
+            return jsonify({'data': [], 'total': 0, 'fetched': 0, 'limit': limit, 'offset': offset}), 200
 
-        # ── ml_predictions ────────────────────────────────────────────────────
-        if source in ('all', 'predictions'):
-            q = supabase.table('ml_predictions').select('*, user_devices(device_name)')
+        db_type = _TYPE_MAP.get(pred_type, pred_type)
+
+        # ml_history_unified (migrations/001) UNIONs ml_predictions and
+        # detection_logs, so ordering and OFFSET/LIMIT happen in Postgres
+        # over the combined feed — no per-table over-fetch or Python re-sort.
+        def history_query(*args, **kwargs):
+            q = supabase.table('ml_history_unified').select(*args, **kwargs)
             q = _apply_device_filter(q, device_ids)
 
-            if pred_type:
-                type_map = {
-                    'detection':   'object_detection',
-                    'danger':      'danger_prediction',
-                    'environment': 'environment_classification',
-                    'anomaly':     'anomaly',
-                }
-                q = q.eq('prediction_type', type_map.get(pred_type, pred_type))
+            if source == 'predictions': q = q.eq('source', 'ml_prediction')
+            if source == 'detections':  q = q.eq('source', 'detection_log')
 
-            if anom_only:  q = q.eq('is_anomaly', True)
-            if start_date: q = q.gte('created_at', start_date)
-            if end_date:   q = q.lte('created_at', end_date)
-
-            for item in q.order('created_at', desc=True).limit(limit).execute().data:
-                pt         = item.get('prediction_type', 'unknown')
-                result     = {}
-                confidence = None
-
-                if pt == 'anomaly':
-                    health     = _safe_float(item.get('device_health_score'), 0)
-                    score      = _safe_float(item.get('anomaly_score'))
-                    is_anomaly = item.get('is_anomaly', False)
-                    message    = (
-                        f"Device anomaly detected (health: {health:.1f}%)"
-                        if is_anomaly
-                        else f"Device health: {health:.1f}%"
-                    )
-                    result     = {
-                        'score':               score,
-                        'severity':            item.get('anomaly_severity'),
-                        'device_health_score': health,
-                        'message':             message,
-                    }
-                    confidence = _normalize_confidence(score)
-
-                elif pt == 'object_detection':
-                    obj  = item.get('object_detected', 'object')
-                    dist = item.get('distance_cm', 0)
-                    conf = item.get('detection_confidence')
-                    result = {
-                        'object':       obj, 'obstacle_type': obj,
-                        'distance':     dist, 'distance_cm':  dist,
-                        'danger_level': item.get('danger_level'),
-                        'confidence':   conf,
-                    }
-                    confidence = _normalize_confidence(conf)
-
-                elif pt == 'danger_prediction':
-                    score  = _safe_float(item.get('danger_score'), 0)
-                    action = item.get('recommended_action', 'UNKNOWN')
-                    result = {
-                        'danger_score':       score,
-                        'recommended_action': action,
-                        'time_to_collision':  item.get('time_to_collision'),
-                        'message':            f"{action} - Danger score: {score:.1f}",
-                    }
-                    confidence = _normalize_confidence(score / 100) if score > 0 else None
-
-                elif pt == 'environment_classification':
-                    env   = item.get('environment_type', 'unknown')
-                    light = item.get('lighting_condition', 'unknown')
-                    result = {
-                        'environment_type':   env,
-                        'lighting_condition': light,
-                        'complexity_level':   item.get('complexity_level'),
-                        'message':            f"{env} - {light} lighting",
-                    }
-                    confidence = _normalize_confidence(item.get('detection_confidence'))
-
-                combined.append({
-                    'id':               item['id'],
-                    'device_id':        item['device_id'],
-                    'device_name':      (item.get('user_devices') or {}).get('device_name', 'Unknown'),
-                    'prediction_type':  pt,
-                    'is_anomaly':       item.get('is_anomaly', False),
-                    'confidence_score': confidence,
-                    # FIX: convert UTC → PH time so timestamps align with detection_logs
-                    'timestamp':        _to_ph_iso(item['created_at']),
-                    'result':           result,
-                    'source':           'ml_prediction',
-                })
+            if pred_type == 'detection':
+                q = q.in_('prediction_type', ['object_detection', 'detection'])
+            elif pred_type:
+                q = q.eq('prediction_type', db_type)
 
-        # ── detection_logs ────────────────────────────────────────────────────
-        if source in ('all', 'detections') and pred_type in (None, 'detection'):
-            q = supabase.table('detection_logs')\
-                .select('*, user_devices!detection_logs_device_id_fkey(device_name)')
-            q = _apply_device_filter(q, device_ids)
-
-            if anom_only:  q = q.eq('danger_level', 'High')
-            if start_date: q = q.gte('detected_at', start_date)
-            if end_date:   q = q.lte('detected_at', end_date)
-
-            for item in q.order('detected_at', desc=True).limit(limit).execute().data:
-                combined.append({
-                    'id':               item['id'],
-                    'device_id':        item['device_id'],
-                    'device_name':      (item.get('user_devices') or {}).get('device_name', 'Unknown'),
-                    'prediction_type':  'detection',
-                    'is_anomaly':       item['danger_level'] == 'High',
-                    'confidence_score': _normalize_confidence(item.get('detection_confidence')),
-                    # detection_logs.detected_at is already PH time — no conversion needed
-                    'timestamp':        item['detected_at'],
-                    'result': {
-                        'obstacle_type': item['obstacle_type'],
-                        'distance':      item['distance_cm'],
-                        'distance_cm':   item['distance_cm'],
-                        'danger_level':  item['danger_level'],
-                        'alert_type':    item.get('alert_type'),
-                    },
-                    'source': 'detection_log',
-                })
+            if anom_only:  q = q.eq('is_anomaly', True)
+            if start_date: q = q.gte('ts', start_date)
+            if end_date:   q = q.lte('ts', end_date)
+            return q
+
+        # (ts, id) gives a total order, so a keyset cursor never skips or
+        # repeats rows that share a timestamp
+        page_q = history_query(_HISTORY_COLUMNS)\
+            .order('ts', desc=True)\
+            .order('id', desc=True)
+        if use_cursor:
+            ts, rid = _pgrst_quote(cursor_ts), _pgrst_quote(cursor_id)
+            page_q = page_q\
+                .or_(f'ts.lt.{ts},and(ts.eq.{ts},id.lt.{rid})')\
+                .limit(limit)
+        else:
+            page_q = page_q.range(offset, offset + limit - 1)
+        rows = page_q.execute().data
 
-        combined.sort(key=lambda x: x['timestamp'], reverse=True)
+        next_cursor = (
+            {'ts': rows[-1]['ts'], 'id': rows[-1]['id']}
+            if rows and len(rows) == limit else None
+        )
 
-        real_total = 0
-        try:
-            if source in ('all', 'predictions'):
-                q = supabase.table('ml_predictions').select('*', count='exact', head=True)
-                q = _apply_device_filter(q, device_ids)
-                if anom_only: q = q.eq('is_anomaly', True)
-                real_total += q.execute().count or 0
+        # A short page already tells us the exact total — only count when
+        # the page is full (more rows may follow) or we paged past the end.
+        # Cursor pages skip the count (total is null; the first page already
+        # had it) unless the caller asks with ?include_total=true — the
+        # count scans the whole filtered view.
+        if use_cursor and not want_total:
+            real_total = None
+        elif not use_cursor and len(rows) < limit and (rows or offset == 0):
+            real_total = offset + len(rows)
+        else:
+            try:
+                real_total = history_query('id', count='exact', head=True).execute().count or 0
+            except Exception as e:
+                logger.warning("Total count error: %s", e)
+                real_total = offset + len(rows)
+
+        # The body is not streamed: it is built in full here, inside the try,
+        # so a bad row becomes a 500 instead of a truncated 200. Rows are
+        # built and serialized _HISTORY_CHUNK at a time, so only one batch
+        # of built dicts exists at once.
+        dumps = current_app.json.dumps
+        tail  = dumps({'total': real_total, 'fetched': len(rows),
+                       'limit': limit, 'offset': offset,
+                       'next_cursor': next_cursor})
+
+        # A single-type filter means every row takes the same builder —
+        # resolve it once instead of per row.
+        if pred_type and pred_type != 'detection':
+            build = _HISTORY_BUILDERS.get(db_type, _build_other)
+        else:
+            build = lambda item: _HISTORY_BUILDERS.get(item['prediction_type'], _build_other)(item)
 
-            if source in ('all', 'detections') and pred_type in (None, 'detection'):
-                q = supabase.table('detection_logs').select('*', count='exact', head=True)
-                q = _apply_device_filter(q, device_ids)
-                if anom_only: q = q.eq('danger_level', 'High')
-                real_total += q.execute().count or 0
-        except Exception as e:
-            print(f"⚠️ Total count error: {e}")
-            real_total = len(combined)
+        chunks = ['{"data":[']
+        for i in range(0, len(rows), _HISTORY_CHUNK):
+            batch = [build(item) for item in rows[i:i + _HISTORY_CHUNK]]
+            chunks.append((',' if i else '') + dumps(batch)[1:-1])
+        chunks.append('],' + tail[1:])
 
-        return jsonify({
-            'data':    combined[offset:offset + limit],
-            'total':   real_total,
-            'fetched': len(combined),
-            'limit':   limit,
-            'offset':  offset,
-        }), 200
+        return Response(chunks, mimetype='application/json')
 
-    except Exception as e:
-        print(f"Get ML history error: {e}")
-        import traceback; traceback.print_exc()
+    except Exception:
+        logger.exception("Get ML history error")
         return jsonify({'error': 'Failed to get ML history'}), 500
 
 
@@ -245,6 +437,7 @@ def get_ml_history():
 
 @ml_history_bp.route('/anomalies', methods=['GET'])
 @token_required
+@_etag_cached
 def get_anomalies():
     try:
         user_id   = request.current_user['user_id']
@@ -252,7 +445,7 @@ def get_anomalies():
         limit     = request.args.get('limit', 20, type=int)
 
         supabase   = get_supabase()
-        device_ids = _get_device_ids(supabase, user_id, user_role)
+        device_ids = _get_device_ids(user_id, user_role)
 
         if device_ids == []:
             return jsonify({'data': []}), 200
@@ -260,43 +453,26 @@ def get_anomalies():
         combined = []
 
         q = supabase.table('ml_predictions')\
-            .select('*, user_devices(device_name)')\
+            .select('id, device_id, created_at, prediction_type, '
+                    'anomaly_score, anomaly_severity, device_health_score, '
+                    'danger_score, recommended_action, '
+                    'detection_confidence, danger_level, object_detected, distance_cm')\
             .eq('is_anomaly', True)\
             .order('created_at', desc=True)\
             .limit(limit)
         q = _apply_device_filter(q, device_ids)
 
-        for item in q.execute().data:
-            pt       = item.get('prediction_type', 'unknown')
-            score    = None
-            severity = 'medium'
-            message  = 'Anomaly detected'
+        rows  = q.execute().data
+        names = _get_device_names(supabase, user_id, user_role, rows)
 
-            if pt == 'anomaly':
-                health   = _safe_float(item.get('device_health_score'), 0)
-                score    = _normalize_confidence(item.get('anomaly_score'))
-                severity = item.get('anomaly_severity', 'medium')
-                message  = f"Device anomaly detected (health: {health:.1f}%)"
-
-            elif pt == 'danger_prediction':
-                raw_score = _safe_float(item.get('danger_score'), 0)
-                score     = _normalize_confidence(raw_score / 100) if raw_score > 0 else None
-                action    = item.get('recommended_action', 'UNKNOWN')
-                severity  = 'high' if (raw_score or 0) > 70 else 'medium'
-                message   = f"Danger detected - {action} recommended"
-
-            elif pt == 'object_detection':
-                score    = _normalize_confidence(item.get('detection_confidence'))
-                danger   = item.get('danger_level', 'low')
-                severity = danger.lower()
-                obj      = item.get('object_detected', 'object')
-                dist     = item.get('distance_cm', 0)
-                message  = f"{obj.capitalize()} detected at {dist}cm"
+        for item in rows:
+            pt = item['prediction_type']
+            severity, score, message = _ANOMALY_SHAPERS.get(pt, _shape_other_anomaly)(item)
 
             combined.append({
                 'id':          item['id'],
                 'device_id':   item['device_id'],
-                'device_name': (item.get('user_devices') or {}).get('device_name', 'Unknown'),
+                'device_name': names.get(item['device_id']) or 'Unknown',
                 'type':        pt,
                 'severity':    severity,
                 'message':     message,
@@ -306,12 +482,12 @@ def get_anomalies():
                 'source':      'ml_prediction',
             })
 
-        combined.sort(key=lambda x: x['timestamp'], reverse=True)
-        return jsonify({'data': combined[:limit]}), 200
+        # Rows arrive newest-first and capped at `limit` from Postgres, and
+        # _to_ph_iso preserves that order — no Python re-sort/slice needed.
+        return jsonify({'data': combined}), 200
 
-    except Exception as e:
-        print(f"Get anomalies error: {e}")
-        import traceback; traceback.print_exc()
+    except Exception:
+        logger.exception("Get anomalies error")
         return jsonify({'error': 'Failed to get anomalies'}), 500
 
 
@@ -332,7 +508,7 @@ def get_device_health():
         user_role = request.current_user['role']
 
         supabase   = get_supabase()
-        device_ids = _get_device_ids(supabase, user_id, user_role)
+        device_ids = _get_device_ids(user_id, user_role)
 
         if device_ids == []:
             return jsonify({'health_score': 100, 'status': 'No device', 'details': {}}), 200
@@ -342,7 +518,7 @@ def get_device_health():
 
         # Fetch last 24h detection_logs
         q = supabase.table('detection_logs')\
-            .select('danger_level, detection_confidence, detected_at, object_detected')\
+            .select('danger_level, detection_confidence')\
             .gte('detected_at', start_iso)\
             .order('detected_at', desc=True)
         q = _apply_device_filter(q, device_ids)
@@ -438,9 +614,8 @@ def get_device_health():
             },
         }), 200
 
-    except Exception as e:
-        print(f"Get device health error: {e}")
-        import traceback; traceback.print_exc()
+    except Exception:
+        logger.exception("Get device health error")
         return jsonify({'error': 'Failed to get device health'}), 500
 
 
@@ -448,6 +623,7 @@ def get_device_health():
 
 @ml_history_bp.route('/stats', methods=['GET'])
 @token_required
+@_etag_cached(cache_timeout=45)
 def get_ml_stats():
     try:
         user_id   = request.current_user['user_id']
@@ -455,7 +631,7 @@ def get_ml_stats():
         days      = request.args.get('days', 7, type=int)
 
         supabase   = get_supabase()
-        device_ids = _get_device_ids(supabase, user_id, user_role)
+        device_ids = _get_device_ids(user_id, user_role)
 
         if device_ids == []:
             return jsonify({
@@ -467,78 +643,56 @@ def get_ml_stats():
         end_dt    = now_ph()
         start_iso = (end_dt - timedelta(days=days)).isoformat()
 
-        def ml_count(extra=None):
-            q = supabase.table('ml_predictions')\
-                .select('*', count='exact', head=True)\
-                .gte('created_at', start_iso)
-            q = _apply_device_filter(q, device_ids)
-            if extra:
-                for col, val in extra.items():
-                    q = q.in_(col, val) if isinstance(val, list) else q.eq(col, val)
-            return q.execute().count or 0
-
-        def det_count(extra=None):
-            q = supabase.table('detection_logs')\
-                .select('*', count='exact', head=True)\
-                .gte('detected_at', start_iso)
-            q = _apply_device_filter(q, device_ids)
-            if extra:
-                for col, val in extra.items():
-                    q = q.in_(col, val) if isinstance(val, list) else q.eq(col, val)
-            return q.execute().count or 0
-
-        ml_total      = ml_count()
-        det_total     = det_count()
-        ml_anomalies  = ml_count({'is_anomaly': True})
-        det_anomalies = det_count({'danger_level': 'High'})
+        def ml_type_counts():
+            # migrations/005 — totals and anomalies per prediction_type in one GROUP BY
+            rows = supabase.rpc('ml_count_by_type', {
+                'device_ids': device_ids,
+                'start_iso':  start_iso,
+            }).execute().data
+            return {r['prediction_type']: r for r in rows}
+
+        def det_counts():
+            # migrations/008 — total and High-danger logs in one call
+            return supabase.rpc('detection_counts', {
+                'device_ids': device_ids,
+                'start_iso':  start_iso,
+            }).execute().data[0]
+
+        def avg_confidence():
+            # migrations/006 — AVG over both tables in Postgres, no row streaming
+            return supabase.rpc('ml_avg_confidence', {
+                'device_ids': device_ids,
+                'start_iso':  start_iso,
+            }).execute().data
+
+        # Independent queries — one RTT in total instead of running in series
+        ml_future   = _executor.submit(ml_type_counts)
+        det_future  = _executor.submit(det_counts)
+        conf_future = _executor.submit(avg_confidence)
+
+        ml_by_type    = ml_future.result()
+        det           = det_future.result()
+        det_total     = det['total']
+        det_anomalies = det['high']
+        ml_total      = sum(r['cnt'] for r in ml_by_type.values())
+        ml_anomalies  = sum(r['anomalies'] for r in ml_by_type.values())
 
         total     = ml_total + det_total
         anomalies = ml_anomalies + det_anomalies
         anom_rate = (anomalies / total * 100) if total > 0 else 0
 
         by_type = {
-            'anomaly':                    ml_count({'prediction_type': 'anomaly'}),
-            'object_detection':           ml_count({'prediction_type': 'object_detection'}),
-            'danger_prediction':          ml_count({'prediction_type': 'danger_prediction'}),
-            'environment_classification': ml_count({'prediction_type': 'environment_classification'}),
-            'detection':                  det_total,
+            pt: ml_by_type.get(pt, {}).get('cnt', 0)
+            for pt in ('anomaly', 'object_detection', 'danger_prediction',
+                       'environment_classification')
         }
-
-        conf_scores = []
-        try:
-            q = supabase.table('ml_predictions')\
-                .select('prediction_type, anomaly_score, detection_confidence, danger_score')\
-                .gte('created_at', start_iso)
-            q = _apply_device_filter(q, device_ids)
-            for pred in q.execute().data:
-                pt = pred.get('prediction_type')
-                if pt == 'anomaly' and pred.get('anomaly_score') is not None:
-                    v = _normalize_confidence(pred['anomaly_score'])
-                    if v: conf_scores.append(v)
-                elif pt == 'object_detection' and pred.get('detection_confidence') is not None:
-                    v = _normalize_confidence(pred['detection_confidence'])
-                    if v: conf_scores.append(v)
-                elif pt == 'danger_prediction' and pred.get('danger_score') is not None:
-                    v = _normalize_confidence(pred['danger_score'] / 100)
-                    if v: conf_scores.append(v)
-                elif pt == 'environment_classification' and pred.get('detection_confidence') is not None:
-                    v = _normalize_confidence(pred['detection_confidence'])
-                    if v: conf_scores.append(v)
-        except Exception as ce:
-            print(f"⚠️ Confidence fetch error: {ce}")
+        by_type['detection'] = det_total
 
         try:
-            q = supabase.table('detection_logs')\
-                .select('detection_confidence')\
-                .gte('detected_at', start_iso)
-            q = _apply_device_filter(q, device_ids)
-            for row in q.execute().data:
-                v = _normalize_confidence(row.get('detection_confidence'))
-                if v: conf_scores.append(v)
+            avg_conf = conf_future.result() or 0.0
         except Exception as ce:
-            print(f"⚠️ Detection confidence fetch error: {ce}")
-
-        avg_conf = (sum(conf_scores) / len(conf_scores)) if conf_scores else 0.0
+            logger.warning("Confidence fetch error: %s", ce)
+            avg_conf = 0.0
 
         return jsonify({
             'totalPredictions': total,
@@ -549,9 +703,8 @@ def get_ml_stats():
             'bySource':         {'ml_predictions': ml_total, 'detection_logs': det_total},
         }), 200
 
-    except Exception as e:
-        print(f"Get ML stats error: {e}")
-        import traceback; traceback.print_exc()
+    except Exception:
+        logger.exception("Get ML stats error")
         return jsonify({'error': 'Failed to get ML stats'}), 500
 
 
@@ -559,6 +712,7 @@ def get_ml_stats():
 
 @ml_history_bp.route('/daily-summary', methods=['GET'])
 @token_required
+@_etag_cached(bucket='%Y-%m-%d %H:%M', cache_timeout=45)   # rollups refresh every minute
 def get_daily_summary():
     try:
         user_id   = request.current_user['user_id']
@@ -569,117 +723,90 @@ def get_daily_summary():
             days = 7
 
         supabase   = get_supabase()
-        device_ids = _get_device_ids(supabase, user_id, user_role)
+        device_ids = _get_device_ids(user_id, user_role)
 
         if device_ids == []:
             return jsonify({'data': []}), 200
 
-        end_dt    = now_ph()
-        start_dt  = end_dt - timedelta(days=days)
-        start_iso = start_dt.isoformat()
-        end_iso   = end_dt.isoformat()
-
-        ml_rows = []
-        page = 0
-        while True:
-            q = supabase.table('ml_predictions')\
-                .select('created_at, prediction_type, is_anomaly, detection_confidence, anomaly_score, danger_score')\
-                .gte('created_at', start_iso)\
-                .lte('created_at', end_iso)
-            q = _apply_device_filter(q, device_ids)
-            batch = q.range(page * 1000, (page + 1) * 1000 - 1).execute().data
-            if not batch:
-                break
-            ml_rows.extend(batch)
-            if len(batch) < 1000:
-                break
-            page += 1
-
-        det_rows = []
-        page = 0
-        while True:
-            q = supabase.table('detection_logs')\
-                .select('detected_at, danger_level, detection_confidence')\
-                .gte('detected_at', start_iso)\
-                .lte('detected_at', end_iso)
-            q = _apply_device_filter(q, device_ids)
-            batch = q.range(page * 1000, (page + 1) * 1000 - 1).execute().data
-            if not batch:
-                break
-            det_rows.extend(batch)
-            if len(batch) < 1000:
-                break
-            page += 1
-
-        daily      = defaultdict(lambda: defaultdict(int))
-        daily_conf = defaultdict(list)
-
-        for row in ml_rows:
-            # FIX: convert UTC created_at → PH time before extracting date
-            # so daily buckets use PH calendar days not UTC days
-            ph_ts = _to_ph_iso(row['created_at'])
-            day   = ph_ts[:10]
-            pt    = row.get('prediction_type', '')
-            daily[day][pt]         += 1
-            daily[day]['ml_total'] += 1
-            if row.get('is_anomaly'):
-                daily[day]['ml_anomaly'] += 1
-
-            if pt == 'anomaly' and row.get('anomaly_score'):
-                v = _normalize_confidence(row['anomaly_score'])
-                if v: daily_conf[day].append(v)
-            elif pt == 'object_detection' and row.get('detection_confidence'):
-                v = _normalize_confidence(row['detection_confidence'])
-                if v: daily_conf[day].append(v)
-            elif pt == 'danger_prediction' and row.get('danger_score'):
-                v = _normalize_confidence(row['danger_score'] / 100)
-                if v: daily_conf[day].append(v)
-            elif pt == 'environment_classification' and row.get('detection_confidence'):
-                v = _normalize_confidence(row['detection_confidence'])
-                if v: daily_conf[day].append(v)
-
-        for row in det_rows:
-            # detection_logs.detected_at is already PH time
-            day = row['detected_at'][:10]
-            daily[day]['det_total'] += 1
-            if row.get('danger_level') == 'High':
-                daily[day]['det_anomaly'] += 1
-            if row.get('detection_confidence'):
-                v = _normalize_confidence(row['detection_confidence'])
-                if v: daily_conf[day].append(v)
-
-        result = []
-        for i in range(days):
-            day_dt  = start_dt + timedelta(days=i)
-            day_key = day_dt.strftime('%Y-%m-%d')
-            d       = daily[day_key]
-
-            count_obj    = d['object_detection']
-            count_danger = d['danger_prediction']
-            count_det    = d['det_total']
-            total        = d['ml_total'] + count_det
-            anomalies    = d['ml_anomaly'] + d['det_anomaly']
-
-            conf_list      = daily_conf[day_key]
-            avg_confidence = round(
-                (sum(conf_list) / len(conf_list)) * 100, 2
-            ) if conf_list else 0.0
-
-            result.append({
-                'date_iso':           day_key,
-                'date':               day_dt.strftime('%b %-d'),
-                'anomalies':          anomalies,
-                'detections':         count_obj + count_det,
-                'danger_predictions': count_danger,
-                'avg_confidence':     avg_confidence,
-                'total_logs':         total,
-            })
+        start_dt = now_ph() - timedelta(days=days)
+
+        # Day keys/labels built once up front, not interleaved with the tally
+        day_dts = [start_dt + timedelta(days=i) for i in range(days)]
+        keys    = [d.strftime('%Y-%m-%d') for d in day_dts]
+        labels  = [d.strftime('%b %-d') for d in day_dts]
+
+        # Pre-aggregated per device/day by migrations/004 — at most
+        # devices × days × types rows, fetched concurrently.
+        def rollup_rows(table, columns):
+            rows, page = [], 0
+            while True:
+                q = supabase.table(table)\
+                    .select(columns)\
+                    .gte('day', keys[0])\
+                    .lte('day', keys[-1])
+                q = _apply_device_filter(q, device_ids)
+                batch = q.range(page * 1000, (page + 1) * 1000 - 1).execute().data
+                rows.extend(batch)
+                if len(batch) < 1000:
+                    return rows
+                page += 1
+
+        ml_future  = _executor.submit(rollup_rows, 'ml_daily_rollup',
+                                      'day, prediction_type, n, n_anomaly, conf_sum, conf_n')
+        det_future = _executor.submit(rollup_rows, 'detection_daily_rollup',
+                                      'day, n, n_high, conf_sum, conf_n')
+
+        # Fixed-schema per-day columns indexed by position in `keys`
+        idx         = {k: i for i, k in enumerate(keys)}
+        ml_total    = [0] * days
+        ml_anomaly  = [0] * days
+        obj_count   = [0] * days
+        danger      = [0] * days
+        det_total   = [0] * days
+        det_anomaly = [0] * days
+        conf_sum    = [0.0] * days
+        conf_n      = [0] * days
+
+        for row in ml_future.result():
+            i = idx.get(row['day'])
+            if i is None:
+                continue
+            pt = row['prediction_type']
+            ml_total[i]   += row['n']
+            ml_anomaly[i] += row['n_anomaly']
+            conf_sum[i]   += row['conf_sum']
+            conf_n[i]     += row['conf_n']
+            if pt == 'object_detection':
+                obj_count[i] += row['n']
+            elif pt == 'danger_prediction':
+                danger[i] += row['n']
+
+        for row in det_future.result():
+            i = idx.get(row['day'])
+            if i is None:
+                continue
+            det_total[i]   += row['n']
+            det_anomaly[i] += row['n_high']
+            conf_sum[i]    += row['conf_sum']
+            conf_n[i]      += row['conf_n']
+
+        result = [
+            {
+                'date_iso':           keys[i],
+                'date':               labels[i],
+                'anomalies':          ml_anomaly[i] + det_anomaly[i],
+                'detections':         obj_count[i] + det_total[i],
+                'danger_predictions': danger[i],
+                'avg_confidence':     round(conf_sum[i] / conf_n[i] * 100, 2) if conf_n[i] else 0.0,
+                'total_logs':         ml_total[i] + det_total[i],
+            }
+            for i in range(days)
+        ]
 
         return jsonify({'data': result}), 200
 
-    except Exception as e:
-        print(f"Get daily summary error: {e}")
-        import traceback; traceback.print_exc()
+    except Exception:
+        logger.exception("Get daily summary error")
         return jsonify({'error': 'Failed to get daily summary'}), 500
     
 # ── ADD THIS ROUTE to ml_history_bp.py on Render ─────────────────────────────
@@ -705,7 +832,7 @@ def get_detection_anomalies():
         user_role = request.current_user['role']
 
         supabase   = get_supabase()
-        device_ids = _get_device_ids(supabase, user_id, user_role)
+        device_ids = _get_device_ids(user_id, user_role)
 
         if device_ids == []:
             return jsonify({'anomalies': [], 'is_anomaly': False, 'summary': 'No device paired'}), 200
@@ -771,7 +898,7 @@ def get_detection_anomalies():
 
             def _count_window(start_iso, end_iso):
                 q2 = supabase.table('detection_logs')\
-                    .select('*', count='exact', head=True)\
+                    .select('id', count='exact', head=True)\
                     .gte('detected_at', start_iso)\
                     .lte('detected_at', end_iso)
                 q2 = _apply_device_filter(q2, device_ids)
@@ -788,7 +915,7 @@ def get_detection_anomalies():
                     'value':    recent_count,
                 })
         except Exception as e:
-            print(f"[detection-anomalies] flood check failed (non-critical): {e}")
+            logger.warning("detection-anomalies flood check failed (non-critical): %s", e)
 
         # ── Signal 4: Pattern shift ───────────────────────────────────────────
         # Compare dominant object in last 5 vs previous 15
@@ -854,7 +981,6 @@ def get_detection_anomalies():
             'timestamp': now_ph_iso(),
         }), 200
 
-    except Exception as e:
-        print(f"Get detection anomalies error: {e}")
-        import traceback; traceback.print_exc()
+    except Exception:
+        logger.exception("Get detection anomalies error")
         return jsonify({'error': 'Failed to get detection anomalies'}), 500
\ No newline at end of file
@@ -1,23 +1,92 @@
 from flask import Blueprint, request, jsonify
 from app.services.supabase_client import get_supabase
 from app.middleware.auth import token_required, admin_required
+from app.services.cache import cache, cache_is_local
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
 
 settings_bp = Blueprint('settings', __name__, url_prefix='/api/settings')
 
+# Columns the settings responses actually read
+_SETTINGS_COLUMNS = 'sensitivity,distance_threshold,alert_mode,ultrasonic_enabled,camera_enabled'
+
+SETTINGS_TTL = 60
+
+
+# ── Shared helpers ─────────────────────────────────────────────────────────────
+
+def _settings_payload(row):
+    return {
+        'sensitivity':       row['sensitivity'],
+        'distanceThreshold': row['distance_threshold'],
+        'alertMode':         row['alert_mode'],
+        'ultrasonicEnabled': row['ultrasonic_enabled'],
+        'cameraEnabled':     row['camera_enabled'],
+    }
+
+
+@cache.memoize(timeout=SETTINGS_TTL, unless=cache_is_local)
+def _load_settings(user_id):
+    """
+    Response payload for user_id's settings row, or None if it has none.
+
+    Cached per user in Redis because the Pi polls /device; settings only
+    change through the PUT and /reset routes, which call
+    _invalidate_settings(). With a per-worker cache this reads through,
+    so a save is visible to every worker at once (the ETag still saves
+    the response body on unchanged polls).
+    """
+    response = get_supabase().table('settings')\
+        .select(_SETTINGS_COLUMNS)\
+        .eq('user_id', user_id)\
+        .limit(1)\
+        .execute()
+    return _settings_payload(response.data[0]) if response.data else None
+
+
+def _invalidate_settings(user_id):
+    try:
+        cache.delete_memoized(_load_settings, user_id)
+    except Exception as e:
+        logger.warning("Settings cache invalidation failed for %s: %s", user_id, e)
+
+
+def _device_token_key(device_token):
+    return 'settings:device:' + hashlib.blake2b(device_token.encode(), digest_size=16).hexdigest()
+
+
+def invalidate_device_token(device_token):
+    """Forget the cached owner of a device token that was replaced or deleted."""
+    if not device_token:
+        return
+    try:
+        cache.delete(_device_token_key(device_token))
+    except Exception as e:
+        logger.warning("Device token cache invalidation failed: %s", e)
+
+
+def _conditional_settings(payload):
+    """200 with a weak ETag over the body, or a 304 if the caller has it."""
+    response = jsonify({'data': payload})
+    response.set_etag(hashlib.blake2b(response.get_data(), digest_size=16).hexdigest(), weak=True)
+    response.headers['Cache-Control'] = 'private, must-revalidate'
+    return response.make_conditional(request)
+
+
+# ── Routes ─────────────────────────────────────────────────────────────────────
+
 @settings_bp.route('', methods=['GET'])   
 @token_required
 def get_settings():
     """Get user settings"""
     try:
         user_id = request.current_user['user_id']
+        payload = _load_settings(user_id)
         
-        supabase = get_supabase()
-        response = supabase.table('settings')\
-            .select('*')\
-            .eq('user_id', user_id)\
-            .execute()
-        
-        if not response.data:
+        if payload is None:
+            supabase = get_supabase()
             default_settings = {
                 'user_id': user_id,
                 'sensitivity': 75,
@@ -27,27 +96,26 @@ def get_settings():
                 'camera_enabled': True,
                 'updated_by': user_id
             }
-            insert_response = supabase.table('settings').insert(default_settings).execute()
+            # A concurrent first visit may have created the row already —
+            # ignore_duplicates turns that into a no-op (empty data).
+            insert_response = supabase.table('settings')\
+                .upsert(default_settings, on_conflict='user_id', ignore_duplicates=True)\
+                .execute()
+            if not insert_response.data:
+                insert_response = supabase.table('settings')\
+                    .select(_SETTINGS_COLUMNS)\
+                    .eq('user_id', user_id)\
+                    .limit(1)\
+                    .execute()
             if not insert_response.data:
                 return jsonify({'error': 'Failed to create settings'}), 500
-            settings = insert_response.data[0]
-        else:
-            settings = response.data[0]
+            payload = _settings_payload(insert_response.data[0])
+            _invalidate_settings(user_id)
         
-        return jsonify({
-            'data': {
-                'sensitivity': settings['sensitivity'],
-                'distanceThreshold': settings['distance_threshold'],
-                'alertMode': settings['alert_mode'],
-                'ultrasonicEnabled': settings['ultrasonic_enabled'],
-                'cameraEnabled': settings['camera_enabled']
-            }
-        }), 200
+        return _conditional_settings(payload)
         
-    except Exception as e:
-        print(f"Get settings error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Get settings error")
         return jsonify({'error': 'Failed to get settings'}), 500
 
 
@@ -78,29 +146,21 @@ def update_settings():
         if 'cameraEnabled' in data:
             update_data['camera_enabled'] = data['cameraEnabled']
         
-        response = supabase.table('settings')\
-            .update(update_data)\
-            .eq('user_id', user_id)\
-            .execute()
-        
-        try:
-            supabase.table('activity_logs').insert({
-                'user_id': user_id,
-                'action': 'Settings Updated',
-                'description': f"User {request.current_user['username']} updated settings"
-            }).execute()
-        except Exception as log_error:
-            print(f"Warning: Could not log activity: {log_error}")
-        
+        # Update + activity log in one round trip (migrations/010)
+        response = supabase.rpc('update_settings_and_log', {
+            'p_user_id':     user_id,
+            'p_updates':     update_data,
+            'p_description': f"User {request.current_user['username']} updated settings",
+        }).execute()
+        _invalidate_settings(user_id)
+
         return jsonify({
             'message': 'Settings updated successfully',
             'data': response.data
         }), 200
         
-    except Exception as e:
-        print(f"Update settings error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Update settings error")
         return jsonify({'error': 'Failed to update settings'}), 500
 
 
@@ -126,16 +186,15 @@ def reset_settings():
             .update(default_settings)\
             .eq('user_id', user_id)\
             .execute()
+        _invalidate_settings(user_id)
         
         return jsonify({
             'message': 'Settings reset to default',
             'data': response.data
         }), 200
         
-    except Exception as e:
-        print(f"Reset settings error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Reset settings error")
         return jsonify({'error': 'Failed to reset settings'}), 500
 
 
@@ -152,10 +211,8 @@ def get_global_settings():
         
         return jsonify({'data': response.data}), 200
         
-    except Exception as e:
-        print(f"Get global settings error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Get global settings error")
         return jsonify({'error': 'Failed to get global settings'}), 500
 
 
@@ -171,28 +228,30 @@ def get_device_settings():
         if not device_token:
             return jsonify({'error': 'Device token required'}), 401
         
-        supabase = get_supabase()
-        
-        # Find device by token
-        device_response = supabase.table('user_devices')\
-            .select('user_id')\
-            .eq('device_token', device_token)\
-            .limit(1)\
-            .execute()
+        # Token → owner is cached in Redis only: regenerate_device_token and
+        # delete_device drop the entry, which a per-worker cache couldn't
+        # do for the other workers
+        token_key = _device_token_key(device_token)
+        user_id   = None if cache_is_local() else cache.get(token_key)
         
-        if not device_response.data:
-            return jsonify({'error': 'Invalid device token'}), 401
-        
-        user_id = device_response.data[0]['user_id']
-        
-        # Get settings for this user
-        settings_response = supabase.table('settings')\
-            .select('*')\
-            .eq('user_id', user_id)\
-            .limit(1)\
-            .execute()
+        if user_id is None:
+            # Owner + settings row in one round trip (migrations/011)
+            rows = get_supabase().rpc('get_settings_by_device_token', {
+                'token': device_token,
+            }).execute().data
+            
+            if not rows:
+                return jsonify({'error': 'Invalid device token'}), 401
+            
+            user_id = rows[0]['user_id']
+            if not cache_is_local():
+                cache.set(token_key, user_id, timeout=SETTINGS_TTL)
+            row     = rows[0]['settings']
+            payload = _settings_payload(row) if row else None
+        else:
+            payload = _load_settings(user_id)
         
-        if not settings_response.data:
+        if payload is None:
             # Return defaults
             return jsonify({
                 'data': {
@@ -204,20 +263,8 @@ def get_device_settings():
                 }
             }), 200
         
-        settings = settings_response.data[0]
+        return _conditional_settings(payload)
         
-        return jsonify({
-            'data': {
-                'sensitivity': settings['sensitivity'],
-                'distanceThreshold': settings['distance_threshold'],
-                'alertMode': settings['alert_mode'],
-                'ultrasonicEnabled': settings['ultrasonic_enabled'],
-                'cameraEnabled': settings['camera_enabled']
-            }
-        }), 200
-        
-    except Exception as e:
-        print(f"Get device settings error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Get device settings error")
         return jsonify({'error': 'Failed to get device settings'}), 500
\ No newline at end of file
@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify
 from app.services.supabase_client import get_supabase
 from app.middleware.auth import token_required, admin_required, check_permission
+import logging
+
+logger = logging.getLogger(__name__)
 
 statistics_bp = Blueprint('statistics', __name__, url_prefix='/api/statistics')
 
@@ -18,7 +21,7 @@ def _device_ids(supabase, user_id, user_role):
 
 def _det_count(supabase, device_ids, filters=None):
     """Count detection_logs rows, optionally filtered."""
-    q = supabase.table('detection_logs').select('*', count='exact', head=True)
+    q = supabase.table('detection_logs').select('id', count='exact', head=True)
     if device_ids:
         q = q.in_('device_id', device_ids)
     if filters:
@@ -32,7 +35,7 @@ def _ml_count(supabase, device_ids, filters=None):
     Count ml_predictions rows, optionally filtered.
     Used for anomaly counts from the actual anomaly model output.
     """
-    q = supabase.table('ml_predictions').select('*', count='exact', head=True)
+    q = supabase.table('ml_predictions').select('id', count='exact', head=True)
     if device_ids:
         q = q.in_('device_id', device_ids)
     if filters:
@@ -78,8 +81,7 @@ def get_daily_stats(days):
         return jsonify({'data': result}), 200
 
     except Exception as e:
-        print(f"❌ Get daily stats error: {e}")
-        import traceback; traceback.print_exc()
+        logger.exception("Get daily stats error")
         return jsonify({'error': str(e)}), 500
 
 
@@ -117,9 +119,8 @@ def get_obstacle_statistics():
 
         return jsonify({'data': result}), 200
 
-    except Exception as e:
-        print(f"❌ Get obstacle statistics error: {e}")
-        import traceback; traceback.print_exc()
+    except Exception:
+        logger.exception("Get obstacle statistics error")
         return jsonify({'error': 'Failed to get obstacle statistics'}), 500
 
 
@@ -166,9 +167,8 @@ def get_hourly_patterns():
 
         return jsonify({'data': result}), 200
 
-    except Exception as e:
-        print(f"❌ Get hourly patterns error: {e}")
-        import traceback; traceback.print_exc()
+    except Exception:
+        logger.exception("Get hourly patterns error")
         return jsonify({'error': 'Failed to get hourly patterns'}), 500
 
 
@@ -254,7 +254,6 @@ def get_ml_statistics():
             },
         }), 200
 
-    except Exception as e:
-        print(f"❌ Get ML statistics error: {e}")
-        import traceback; traceback.print_exc()
+    except Exception:
+        logger.exception("Get ML statistics error")
         return jsonify({'error': 'Failed to get ML statistics'}), 500
\ No newline at end of file
@@ -0,0 +1,89 @@
+from flask import current_app, g
+from flask_caching import Cache
+from cachetools import TTLCache
+from app.services.supabase_client import get_supabase
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Initialised in create_app() — Redis when REDIS_URL is set, otherwise an
+# in-process SimpleCache per gunicorn worker.
+cache = Cache()
+
+DEVICE_IDS_TTL = 60
+
+# Per-worker fallback for the device lists when there is no Redis. An
+# invalidation only reaches the worker that handled the device change, so
+# the other workers may serve the old list for up to DEVICE_IDS_TTL —
+# acceptable for a mapping that changes on pairing, not per request.
+_local_devices      = TTLCache(maxsize=10_000, ttl=DEVICE_IDS_TTL)
+_local_devices_lock = threading.Lock()
+
+
+def cache_is_local():
+    """
+    True when the cache is per-process (no REDIS_URL).
+
+    Pass as `unless=` to memoized lookups that writes invalidate: with
+    several workers, a delete only reaches the worker that handled the
+    write and the others would keep serving the stale entry until it
+    expires. Those lookups hit the database directly instead.
+    """
+    return current_app.config.get('CACHE_TYPE') != 'RedisCache'
+
+
+@cache.memoize(timeout=DEVICE_IDS_TTL, unless=cache_is_local)
+def _load_user_devices(user_id):
+    result = get_supabase().table('user_devices')\
+        .select('id, device_name')\
+        .eq('user_id', user_id)\
+        .execute()
+    return {d['id']: d['device_name'] for d in result.data}
+
+
+def get_user_devices(user_id):
+    """
+    Return {user_devices.id: device_name} for the devices owned by user_id.
+
+    Every /api/ml-history/* call needs it (the ETag check, the view and the
+    device-name lookup), so the result is kept on flask.g for the rest of
+    the request — one user_devices query per request with any number of
+    workers. Across requests it is cached per user for DEVICE_IDS_TTL, in
+    Redis or else in this worker; the mapping changes when a device is
+    registered, renamed or deleted, and those routes call
+    invalidate_user_device_ids().
+    """
+    per_request = g.setdefault('user_devices', {})
+    if user_id not in per_request:
+        per_request[user_id] = _cached_user_devices(user_id)
+    return per_request[user_id]
+
+
+def _cached_user_devices(user_id):
+    if not cache_is_local():
+        return _load_user_devices(user_id)
+
+    with _local_devices_lock:
+        devices = _local_devices.get(user_id)
+    if devices is None:
+        devices = _load_user_devices(user_id)
+        with _local_devices_lock:
+            _local_devices[user_id] = devices
+    return devices
+
+
+def get_user_device_ids(user_id):
+    """Return the list of user_devices.id owned by user_id (cached)."""
+    return list(get_user_devices(user_id))
+
+
+def invalidate_user_device_ids(user_id):
+    """Drop the cached device list for user_id after a device change."""
+    g.pop('user_devices', None)
+    with _local_devices_lock:
+        _local_devices.pop(user_id, None)
+    try:
+        cache.delete_memoized(_load_user_devices, user_id)
+    except Exception as e:
+        logger.warning("Device cache invalidation failed for %s: %s", user_id, e)
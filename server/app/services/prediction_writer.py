@@ -0,0 +1,168 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from postgrest.exceptions import APIError
+
+from app.services.supabase_client import supabase_client
+
+logger = logging.getLogger(__name__)
+
+# Error codes that mean "try again later": HTTP 5xx without a JSON body,
+# SQLSTATE classes 08 (connection), 40 (rollback/deadlock), 53 (resources),
+# 57 (shutdown), and PostgREST's PGRST0xx connection errors.
+_TRANSIENT_CODE_PREFIXES = ('5', '08', '40', 'PGRST0')
+
+# Error codes that blame particular rows: SQLSTATE classes 22 (bad value)
+# and 23 (constraint violation). Anything else — missing column, RLS, JWT —
+# would fail every row alike, so splitting the batch can't help.
+_ROW_CODE_PREFIXES = ('22', '23')
+
+
+def _error_code(e):
+    return str(e.code or '') if isinstance(e, APIError) else ''
+
+
+def _is_transient(e):
+    """True for connection errors, timeouts and 5xx responses."""
+    return not isinstance(e, APIError) or _error_code(e).startswith(_TRANSIENT_CODE_PREFIXES)
+
+
+def _is_row_error(e):
+    """True if the database rejected some of the rows themselves."""
+    return _error_code(e).startswith(_ROW_CODE_PREFIXES)
+
+
+class BufferedInserter:
+    """
+    Background bulk inserter for high-rate device writes.
+
+    Routes call enqueue(row) and return immediately; a daemon thread drains
+    the queue and writes up to `max_batch_size` rows per INSERT, or whatever
+    has arrived after `flush_interval` seconds.
+
+    Failures are split by cause. Rows the database rejects (bad value,
+    constraint) are isolated by halving the batch and dropped. Connection
+    errors, timeouts and 5xx responses put the batch back on the queue and
+    the worker backs off (doubling up to `max_retry_delay`) until Supabase
+    answers again. Errors no row could pass — schema, auth, permission —
+    drop the batch with one log line.
+
+    The worker is started lazily per process (gunicorn forks after import),
+    and pending rows are flushed at interpreter exit.
+    """
+
+    def __init__(self, table, max_batch_size=500, flush_interval=1.0,
+                 max_queue_size=10000, retry_delay=0.5, max_retry_delay=30.0):
+        self.table           = table
+        self.max_batch_size  = max_batch_size
+        self.flush_interval  = flush_interval
+        self.retry_delay     = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._queue          = queue.Queue(maxsize=max_queue_size)
+        self._lock           = threading.Lock()
+        self._pid            = None
+
+    def enqueue(self, row):
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            # Backpressure: one inline attempt rather than silently dropping
+            logger.warning("%s write queue full — inserting synchronously", self.table)
+            if self._write([row]):
+                logger.error("Dropping %s row: queue full and insert failed", self.table)
+
+    def flush(self):
+        """Write everything queued so far, one attempt per batch (called at exit)."""
+        rows = []
+        while True:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for i in range(0, len(rows), self.max_batch_size):
+            pending = self._write(rows[i:i + self.max_batch_size])
+            if pending:
+                logger.error("Dropping %d %s rows at exit: insert failed", len(pending), self.table)
+
+    # ── Worker ────────────────────────────────────────────────────────────────
+
+    def _ensure_worker(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            threading.Thread(
+                target=self._run, name=f'{self.table}-writer', daemon=True
+            ).start()
+            atexit.register(self.flush)
+            self._pid = os.getpid()
+
+    def _run(self):
+        delay = self.retry_delay
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            pending = self._write(batch)
+            if not pending:
+                delay = self.retry_delay
+                continue
+
+            self._requeue(pending)
+            time.sleep(delay)
+            delay = min(delay * 2, self.max_retry_delay)
+
+    def _requeue(self, rows):
+        dropped = 0
+        for row in rows:
+            try:
+                self._queue.put_nowait(row)
+            except queue.Full:
+                dropped += 1
+        if dropped:
+            logger.error("Dropping %d %s rows: queue full during outage", dropped, self.table)
+
+    def _write(self, rows):
+        """
+        One INSERT of `rows`. Returns the rows left unwritten by a transient
+        failure (for the caller to retry); rejected rows are dropped.
+        """
+        try:
+            supabase_client.client.table(self.table).insert(rows).execute()
+            return []
+        except Exception as e:
+            if _is_transient(e):
+                logger.warning("%s insert of %d rows failed: %s", self.table, len(rows), e)
+                return rows
+            if not _is_row_error(e):
+                logger.error("Dropping %d %s rows: insert rejected (%s)", len(rows), self.table, e)
+                return []
+            if len(rows) == 1:
+                logger.error("Dropping %s row rejected by the database (%s): %s",
+                             self.table, e, rows[0])
+                return []
+
+        # Isolate the bad row(s); stop splitting if the connection goes
+        mid     = len(rows) // 2
+        pending = self._write(rows[:mid])
+        if pending:
+            return pending + rows[mid:]
+        return self._write(rows[mid:])
+
+
+# ml_predictions rows from POST /api/device/telemetry
+prediction_writer = BufferedInserter('ml_predictions')
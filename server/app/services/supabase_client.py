@@ -1,9 +1,17 @@
 from supabase import create_client, Client
 from flask import current_app
+import threading
 
 class SupabaseClient:
-    """Singleton Supabase client with both user and admin instances"""
+    """
+    Singleton Supabase client with both user and admin instances.
+
+    Each Client is created once per process and reused by every request, so
+    its underlying HTTP/2 httpx session keeps connections to PostgREST warm
+    instead of paying a TCP+TLS handshake per call.
+    """
     _instance = None
+    _lock = threading.Lock()
     _user_client: Client = None  # Anon key (respects RLS)
     _admin_client: Client = None  # Service role key (bypasses RLS)
     
@@ -14,15 +22,17 @@ class SupabaseClient:
     
     def initialize(self, url: str, key: str):
         """Initialize user Supabase client (anon key)"""
-        if self._user_client is None:
-            self._user_client = create_client(url, key)
-            print("✅ User Supabase client initialized (anon key)")
+        with self._lock:
+            if self._user_client is None:
+                self._user_client = create_client(url, key)
+                print("✅ User Supabase client initialized (anon key)")
     
     def initialize_admin(self, url: str, service_key: str):
         """Initialize admin Supabase client (service role key)"""
-        if self._admin_client is None:
-            self._admin_client = create_client(url, service_key)
-            print("⚠️  Admin Supabase client initialized (service role key)")
+        with self._lock:
+            if self._admin_client is None:
+                self._admin_client = create_client(url, service_key)
+                print("⚠️  Admin Supabase client initialized (service role key)")
     
     @property
     def client(self) -> Client:
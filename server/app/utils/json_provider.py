@@ -0,0 +1,33 @@
+import orjson
+from flask.json.provider import DefaultJSONProvider
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson.
+
+    jsonify() / returning a dict from a view go through this, so every
+    route gets orjson's native encoder without call-site changes, and
+    request.get_json() parses bodies with orjson too. Types orjson doesn't
+    handle (Decimal, UUID, date/datetime, dataclasses) fall back to Flask's
+    default hook, so the wire format is unchanged.
+    """
+
+    option = (
+        orjson.OPT_NON_STR_KEYS
+        | orjson.OPT_SERIALIZE_NUMPY
+        | orjson.OPT_PASSTHROUGH_DATETIME   # keep Flask's HTTP-date format
+    )
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=self.option),
+            mimetype=self.mimetype,
+        )
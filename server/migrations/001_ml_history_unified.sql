@@ -0,0 +1,76 @@
+-- ─────────────────────────────────────────────────────────────────────────────
+-- ml_history_unified
+--
+-- One time-ordered feed over ml_predictions + detection_logs so that
+-- GET /api/ml-history can ORDER BY / LIMIT / OFFSET in Postgres instead of
+-- fetching `limit` rows from each table and merging them in Python.
+--
+-- `ts` is the shared sort/filter key in PH wall-clock time:
+--   * ml_predictions.created_at is timestamptz (UTC)  → converted to Asia/Manila
+--   * detection_logs.detected_at is written via now_ph_iso() and is already PH
+-- `created_at` is only set for ml_predictions rows; the API still converts it
+-- with _to_ph_iso() so the response format is unchanged.
+--
+-- security_invoker keeps the RLS policies of the underlying tables in force
+-- for the anon-key client used by the routes.
+--
+-- Run once in the Supabase SQL editor.
+-- ─────────────────────────────────────────────────────────────────────────────
+
+CREATE OR REPLACE VIEW ml_history_unified
+WITH (security_invoker = true) AS
+SELECT
+    p.id::text                              AS id,
+    p.device_id,
+    ud.device_name,
+    'ml_prediction'                         AS source,
+    p.prediction_type,
+    COALESCE(p.is_anomaly, false)           AS is_anomaly,
+    p.created_at AT TIME ZONE 'Asia/Manila' AS ts,
+    p.created_at,
+    p.anomaly_score,
+    p.anomaly_severity,
+    p.device_health_score,
+    p.object_detected,
+    p.distance_cm,
+    p.danger_level,
+    p.detection_confidence,
+    p.danger_score,
+    p.recommended_action,
+    p.time_to_collision,
+    p.environment_type,
+    p.lighting_condition,
+    p.complexity_level,
+    NULL                                    AS obstacle_type,
+    NULL                                    AS alert_type
+FROM ml_predictions p
+LEFT JOIN user_devices ud ON ud.id = p.device_id
+
+UNION ALL
+
+SELECT
+    d.id::text,
+    d.device_id,
+    ud.device_name,
+    'detection_log',
+    'detection',
+    COALESCE(d.danger_level = 'High', false),
+    d.detected_at,
+    NULL,
+    NULL,
+    NULL,
+    NULL,
+    d.object_detected,
+    d.distance_cm,
+    d.danger_level,
+    d.detection_confidence,
+    NULL,
+    NULL,
+    NULL,
+    NULL,
+    NULL,
+    NULL,
+    d.obstacle_type,
+    d.alert_type
+FROM detection_logs d
+LEFT JOIN user_devices ud ON ud.id = d.device_id;
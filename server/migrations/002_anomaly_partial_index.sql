@@ -0,0 +1,15 @@
+-- ─────────────────────────────────────────────────────────────────────────────
+-- Partial index for GET /api/ml-history/anomalies.
+--
+-- That route reads ml_predictions directly with is_anomaly = true,
+-- device_id IN (...) ORDER BY created_at DESC LIMIT n, which this index
+-- answers without touching the heap rows of normal predictions.
+--
+-- It does not serve anomaly filters on ml_history_unified: the view
+-- exposes COALESCE(p.is_anomaly, false), which can't match the partial
+-- predicate.
+-- ─────────────────────────────────────────────────────────────────────────────
+
+CREATE INDEX IF NOT EXISTS ml_predictions_device_anom_ts
+    ON ml_predictions (device_id, created_at DESC)
+    WHERE is_anomaly;
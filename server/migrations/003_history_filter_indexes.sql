@@ -0,0 +1,23 @@
+-- ─────────────────────────────────────────────────────────────────────────────
+-- Composite index for the filtered paths in /api/ml-history/*.
+--
+-- The /anomalies path (is_anomaly + device_id + created_at) is covered by
+-- 002_anomaly_partial_index.sql. This covers the remaining hot predicate:
+--   • prediction_type = X AND device_id IN (...) AND ts >= :start,
+--     ORDER BY ts DESC — ts is created_at AT TIME ZONE 'Asia/Manila' in
+--     ml_history_unified (migrations/001), so the index is on that
+--     expression; plain created_at could serve neither filter nor order
+--
+-- On a large live table, run each statement on its own with
+-- CREATE INDEX CONCURRENTLY (not allowed inside a transaction block).
+-- ─────────────────────────────────────────────────────────────────────────────
+
+-- Superseded: plain created_at didn't match the view's ts
+DROP INDEX IF EXISTS ml_predictions_type_device_ts;
+
+-- Unused: nothing filters logs on danger_level IN ('High','Critical'), and
+-- it cost every detection insert
+DROP INDEX IF EXISTS detection_logs_danger_device_ts;
+
+CREATE INDEX IF NOT EXISTS ml_predictions_type_device_ph_ts
+    ON ml_predictions (prediction_type, device_id, (created_at AT TIME ZONE 'Asia/Manila') DESC);
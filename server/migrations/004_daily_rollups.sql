@@ -0,0 +1,178 @@
+-- ─────────────────────────────────────────────────────────────────────────────
+-- Daily rollups for GET /api/ml-history/daily-summary
+--
+-- The endpoint used to page every raw row of the window (up to 90 days)
+-- into Python and bucket it per PH calendar day. These tables hold the
+-- per-device, per-day counts instead, so the endpoint reads at most
+-- devices × days × types rows and does no per-row work.
+--
+-- Confidence is stored as (conf_sum, conf_n) rather than an average so the
+-- API can combine devices, prediction types and both tables into one
+-- weighted daily mean. The CASE mirrors _normalize_confidence():
+--   raw ≤ 0.01 → ignored, raw > 1 → treated as a percentage.
+--
+-- Day buckets:
+--   * ml_predictions.created_at is timestamptz (UTC) → Asia/Manila date
+--   * detection_logs.detected_at is already PH wall-clock time
+--
+-- RLS is on, as for the base tables: a rollup row is visible exactly when
+-- its device is visible to the caller in user_devices, so the policies on
+-- user_devices decide (the API also filters by the caller's device_ids).
+--
+-- Maintenance is incremental: refresh_daily_rollups(p_days) re-aggregates
+-- only the last p_days PH days (everything older is final), replacing
+-- those days' rows in one transaction so readers never see a half-built
+-- day. The scans use the ts indexes from migrations/007. pg_cron runs it
+-- every minute for today and yesterday, and nightly over the endpoint's
+-- full 90-day window to pick up rows a device uploaded late. An advisory
+-- lock serialises overlapping runs, which would otherwise both rebuild
+-- the same days and collide on the unique keys.
+--
+-- Replaces the earlier materialized views, which were fully recomputed
+-- every minute. Run once in the Supabase SQL editor.
+-- ─────────────────────────────────────────────────────────────────────────────
+
+DO $$
+BEGIN
+    PERFORM cron.unschedule('refresh_daily_rollups');
+EXCEPTION WHEN OTHERS THEN
+    NULL;   -- pg_cron not installed yet, or job never scheduled
+END
+$$;
+
+DROP MATERIALIZED VIEW IF EXISTS ml_daily_rollup;
+DROP MATERIALIZED VIEW IF EXISTS detection_daily_rollup;
+
+
+CREATE TABLE IF NOT EXISTS ml_daily_rollup (
+    device_id       uuid,
+    day             date    NOT NULL,
+    prediction_type text,
+    n               bigint  NOT NULL,
+    n_anomaly       bigint  NOT NULL,
+    conf_sum        float8  NOT NULL,
+    conf_n          bigint  NOT NULL
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS ml_daily_rollup_key
+    ON ml_daily_rollup (device_id, day, prediction_type) NULLS NOT DISTINCT;
+
+
+CREATE TABLE IF NOT EXISTS detection_daily_rollup (
+    device_id       uuid,
+    day             date    NOT NULL,
+    n               bigint  NOT NULL,
+    n_high          bigint  NOT NULL,
+    conf_sum        float8  NOT NULL,
+    conf_n          bigint  NOT NULL
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS detection_daily_rollup_key
+    ON detection_daily_rollup (device_id, day) NULLS NOT DISTINCT;
+
+
+-- ── Row-level security ───────────────────────────────────────────────────────
+
+ALTER TABLE ml_daily_rollup        ENABLE ROW LEVEL SECURITY;
+ALTER TABLE detection_daily_rollup ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS ml_daily_rollup_device_visible ON ml_daily_rollup;
+CREATE POLICY ml_daily_rollup_device_visible ON ml_daily_rollup
+    FOR SELECT
+    USING (EXISTS (SELECT 1 FROM user_devices ud WHERE ud.id = ml_daily_rollup.device_id));
+
+DROP POLICY IF EXISTS detection_daily_rollup_device_visible ON detection_daily_rollup;
+CREATE POLICY detection_daily_rollup_device_visible ON detection_daily_rollup
+    FOR SELECT
+    USING (EXISTS (SELECT 1 FROM user_devices ud WHERE ud.id = detection_daily_rollup.device_id));
+
+
+-- ── Incremental refresh ──────────────────────────────────────────────────────
+
+CREATE OR REPLACE FUNCTION refresh_daily_rollups(p_days int DEFAULT 2)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    since date := (now() AT TIME ZONE 'Asia/Manila')::date - (p_days - 1);
+BEGIN
+    -- Held until commit: a second run waits, then rebuilds on fresh data
+    PERFORM pg_advisory_xact_lock(hashtext('refresh_daily_rollups'));
+
+    DELETE FROM ml_daily_rollup WHERE day >= since;
+
+    INSERT INTO ml_daily_rollup
+        (device_id, day, prediction_type, n, n_anomaly, conf_sum, conf_n)
+    WITH scored AS (
+        SELECT
+            device_id,
+            (created_at AT TIME ZONE 'Asia/Manila')::date AS day,
+            prediction_type,
+            COALESCE(is_anomaly, false)                   AS is_anomaly,
+            CASE prediction_type
+                WHEN 'anomaly'                    THEN anomaly_score
+                WHEN 'object_detection'           THEN detection_confidence
+                WHEN 'environment_classification' THEN detection_confidence
+                WHEN 'danger_prediction'          THEN danger_score / 100.0
+            END::float8                                   AS raw_conf
+        FROM ml_predictions
+        WHERE (created_at AT TIME ZONE 'Asia/Manila') >= since
+    )
+    SELECT
+        device_id,
+        day,
+        prediction_type,
+        count(*),
+        count(*) FILTER (WHERE is_anomaly),
+        COALESCE(sum(CASE WHEN raw_conf > 1 THEN raw_conf / 100 ELSE raw_conf END)
+                 FILTER (WHERE raw_conf > 0.01), 0),
+        count(*) FILTER (WHERE raw_conf > 0.01)
+    FROM scored
+    GROUP BY device_id, day, prediction_type;
+
+    DELETE FROM detection_daily_rollup WHERE day >= since;
+
+    INSERT INTO detection_daily_rollup
+        (device_id, day, n, n_high, conf_sum, conf_n)
+    SELECT
+        device_id,
+        detected_at::date,
+        count(*),
+        count(*) FILTER (WHERE danger_level = 'High'),
+        COALESCE(sum(CASE WHEN detection_confidence > 1
+                          THEN detection_confidence / 100.0
+                          ELSE detection_confidence END)
+                 FILTER (WHERE detection_confidence > 0.01), 0),
+        count(*) FILTER (WHERE detection_confidence > 0.01)
+    FROM detection_logs
+    WHERE detected_at >= since
+    GROUP BY device_id, detected_at::date;
+END
+$$;
+
+
+-- ── Backfill + schedule ──────────────────────────────────────────────────────
+
+-- One-off full build (every day since the first row)
+SELECT refresh_daily_rollups(
+    GREATEST(
+        COALESCE((now() AT TIME ZONE 'Asia/Manila')::date
+                 - (SELECT min(created_at AT TIME ZONE 'Asia/Manila')::date FROM ml_predictions), 0),
+        COALESCE((now() AT TIME ZONE 'Asia/Manila')::date
+                 - (SELECT min(detected_at)::date FROM detection_logs), 0)
+    ) + 1
+);
+
+CREATE EXTENSION IF NOT EXISTS pg_cron;
+
+SELECT cron.schedule(
+    'refresh_daily_rollups',
+    '* * * * *',
+    $$ SELECT refresh_daily_rollups(2) $$
+);
+
+SELECT cron.schedule(
+    'refresh_daily_rollups_window',
+    '30 3 * * *',
+    $$ SELECT refresh_daily_rollups(90) $$
+);
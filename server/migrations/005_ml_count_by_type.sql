@@ -0,0 +1,25 @@
+-- ─────────────────────────────────────────────────────────────────────────────
+-- ml_count_by_type
+--
+-- Per-prediction_type totals and anomaly counts for GET /api/ml-history/stats
+-- in one GROUP BY, replacing six separate count='exact' round-trips
+-- (total, anomalies, and one per prediction_type).
+--
+-- device_ids = NULL means "all devices" (admin callers).
+-- SECURITY INVOKER (the default) keeps ml_predictions RLS in force.
+--
+-- Run once in the Supabase SQL editor.
+-- ─────────────────────────────────────────────────────────────────────────────
+
+CREATE OR REPLACE FUNCTION ml_count_by_type(device_ids uuid[], start_iso timestamptz)
+RETURNS TABLE (prediction_type text, cnt bigint, anomalies bigint)
+LANGUAGE sql STABLE
+AS $$
+    SELECT p.prediction_type,
+           count(*),
+           count(*) FILTER (WHERE p.is_anomaly)
+    FROM ml_predictions p
+    WHERE p.created_at >= start_iso
+      AND (device_ids IS NULL OR p.device_id = ANY (device_ids))
+    GROUP BY p.prediction_type
+$$;
@@ -0,0 +1,43 @@
+-- ─────────────────────────────────────────────────────────────────────────────
+-- ml_avg_confidence
+--
+-- Mean normalised confidence over ml_predictions + detection_logs for
+-- GET /api/ml-history/stats, computed in Postgres instead of streaming every
+-- row of the window to the API. Mirrors _normalize_confidence():
+--   raw ≤ 0.01 → ignored, raw > 1 → treated as a percentage.
+-- Returns NULL when there is nothing to average.
+--
+-- detection_logs.detected_at is PH wall-clock time, so start_iso is shifted
+-- to Asia/Manila before comparing (same convention as migrations/001).
+--
+-- device_ids = NULL means "all devices" (admin callers).
+--
+-- Run once in the Supabase SQL editor.
+-- ─────────────────────────────────────────────────────────────────────────────
+
+CREATE OR REPLACE FUNCTION ml_avg_confidence(device_ids uuid[], start_iso timestamptz)
+RETURNS float8
+LANGUAGE sql STABLE
+AS $$
+    WITH raw AS (
+        SELECT CASE p.prediction_type
+                   WHEN 'anomaly'                    THEN p.anomaly_score
+                   WHEN 'object_detection'           THEN p.detection_confidence
+                   WHEN 'environment_classification' THEN p.detection_confidence
+                   WHEN 'danger_prediction'          THEN p.danger_score / 100.0
+               END::float8 AS v
+        FROM ml_predictions p
+        WHERE p.created_at >= start_iso
+          AND (device_ids IS NULL OR p.device_id = ANY (device_ids))
+
+        UNION ALL
+
+        SELECT d.detection_confidence::float8
+        FROM detection_logs d
+        WHERE d.detected_at >= start_iso AT TIME ZONE 'Asia/Manila'
+          AND (device_ids IS NULL OR d.device_id = ANY (device_ids))
+    )
+    SELECT avg(CASE WHEN v > 1 THEN v / 100 ELSE v END)
+    FROM raw
+    WHERE v > 0.01
+$$;
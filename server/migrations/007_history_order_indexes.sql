@@ -0,0 +1,34 @@
+-- ─────────────────────────────────────────────────────────────────────────────
+-- Ordered-scan indexes for the newest-first reads in /api/ml-history/*.
+--
+-- The filtered paths are covered by 002 (is_anomaly) and 003
+-- (prediction_type, High/Critical logs). These cover the unfiltered ones:
+--   • (device_id, ts DESC) — per-user history pages (the normal case) and
+--     ml_data_version's per-device max() probes
+--   • (ts DESC) on the view's sort key — admin pages with no device filter,
+--     so ORDER BY ts DESC LIMIT n can stop after n index entries
+--
+-- ml_history_unified sorts ml rows by created_at AT TIME ZONE 'Asia/Manila'
+-- (migrations/001). An index on plain created_at can't supply that order,
+-- so the ml_predictions indexes are on the expression itself.
+-- detection_logs.detected_at is already PH wall-clock time and is the
+-- view's ts as-is.
+--
+-- On a large live table, run each statement on its own with
+-- CREATE INDEX CONCURRENTLY (not allowed inside a transaction block).
+-- ─────────────────────────────────────────────────────────────────────────────
+
+-- Superseded: plain created_at order didn't match the view's ts
+DROP INDEX IF EXISTS ml_predictions_device_ts;
+
+CREATE INDEX IF NOT EXISTS ml_predictions_device_ph_ts
+    ON ml_predictions (device_id, (created_at AT TIME ZONE 'Asia/Manila') DESC);
+
+CREATE INDEX IF NOT EXISTS ml_predictions_ph_ts
+    ON ml_predictions ((created_at AT TIME ZONE 'Asia/Manila') DESC);
+
+CREATE INDEX IF NOT EXISTS detection_logs_device_ts
+    ON detection_logs (device_id, detected_at DESC);
+
+CREATE INDEX IF NOT EXISTS detection_logs_ts
+    ON detection_logs (detected_at DESC);
@@ -0,0 +1,73 @@
+-- ─────────────────────────────────────────────────────────────────────────────
+-- uuid[]-parameter RPCs for the remaining per-request IN-list queries.
+--
+-- ml_data_version — newest timestamp of ml_predictions and detection_logs
+--   in one call. Fingerprints the caller's data for the ETag check on every
+--   polled /api/ml-history/* request (was two queries). Each device is one
+--   LIMIT 1 probe of the (device_id, ts DESC) indexes from 007; admins hit
+--   the (ts DESC) indexes' max() — no scan grows with the tables. Both
+--   tables are append-only, so a new newest timestamp is a new version.
+--
+-- detection_counts — total and High-danger detection_logs since start_iso
+--   for /api/ml-history/stats (was two head counts).
+--
+-- Both take the device list as one uuid[] bind parameter instead of an
+-- in.(...) list in the URL, so each has a single plan for every caller.
+-- device_ids = NULL means "all devices" (admin callers).
+--
+-- detection_logs.detected_at is PH wall-clock time, so start_iso is shifted
+-- to Asia/Manila before comparing (same convention as migrations/001, 006).
+--
+-- Run once in the Supabase SQL editor.
+-- ─────────────────────────────────────────────────────────────────────────────
+
+-- Return type changed (row counts dropped) — CREATE OR REPLACE can't do that
+DROP FUNCTION IF EXISTS ml_data_version(uuid[]);
+
+CREATE OR REPLACE FUNCTION ml_data_version(device_ids uuid[])
+RETURNS TABLE (ml_latest text, det_latest text)
+LANGUAGE sql STABLE
+AS $$
+    SELECT
+        CASE WHEN device_ids IS NULL THEN (
+            SELECT max(p.created_at AT TIME ZONE 'Asia/Manila')
+            FROM ml_predictions p
+        ) ELSE (
+            SELECT max(m.ts)
+            FROM unnest(device_ids) AS dev(id),
+            LATERAL (
+                SELECT p.created_at AT TIME ZONE 'Asia/Manila' AS ts
+                FROM ml_predictions p
+                WHERE p.device_id = dev.id
+                ORDER BY p.created_at AT TIME ZONE 'Asia/Manila' DESC
+                LIMIT 1
+            ) m
+        ) END::text,
+
+        CASE WHEN device_ids IS NULL THEN (
+            SELECT max(l.detected_at)
+            FROM detection_logs l
+        ) ELSE (
+            SELECT max(d.ts)
+            FROM unnest(device_ids) AS dev(id),
+            LATERAL (
+                SELECT l.detected_at AS ts
+                FROM detection_logs l
+                WHERE l.device_id = dev.id
+                ORDER BY l.detected_at DESC
+                LIMIT 1
+            ) d
+        ) END::text
+$$;
+
+
+CREATE OR REPLACE FUNCTION detection_counts(device_ids uuid[], start_iso timestamptz)
+RETURNS TABLE (total bigint, high bigint)
+LANGUAGE sql STABLE
+AS $$
+    SELECT count(*),
+           count(*) FILTER (WHERE l.danger_level = 'High')
+    FROM detection_logs l
+    WHERE l.detected_at >= start_iso AT TIME ZONE 'Asia/Manila'
+      AND (device_ids IS NULL OR l.device_id = ANY (device_ids))
+$$;
@@ -0,0 +1,17 @@
+-- ─────────────────────────────────────────────────────────────────────────────
+-- One settings row per user
+--
+-- GET /api/settings creates the default row on a user's first visit with
+-- upsert(on_conflict='user_id', ignore_duplicates=True), so two concurrent
+-- first requests can no longer insert two rows. PostgREST's on_conflict
+-- needs a unique index on the conflict column.
+--
+-- If this fails, duplicates already exist; list them with
+--   SELECT user_id, count(*) FROM settings GROUP BY user_id HAVING count(*) > 1;
+-- and delete the extra rows first.
+--
+-- Run once in the Supabase SQL editor.
+-- ─────────────────────────────────────────────────────────────────────────────
+
+CREATE UNIQUE INDEX IF NOT EXISTS settings_user_id_key
+    ON settings (user_id);
@@ -0,0 +1,47 @@
+-- ─────────────────────────────────────────────────────────────────────────────
+-- update_settings_and_log
+--
+-- PUT /api/settings in one round trip: applies the changed columns to the
+-- caller's settings row and writes the 'Settings Updated' activity_logs
+-- entry (was an UPDATE followed by a separate INSERT).
+--
+-- p_updates holds only the columns being changed, keyed by column name;
+-- jsonb_populate_record() fills every other column from the current row,
+-- so omitted settings keep their values and each value is cast to the
+-- column's own type.
+--
+-- The activity log stays best-effort, as before: a failed INSERT is
+-- swallowed in its own sub-block and never rolls back the settings change.
+--
+-- Returns the updated row(s), same shape as the old update's response.
+--
+-- Run once in the Supabase SQL editor.
+-- ─────────────────────────────────────────────────────────────────────────────
+
+CREATE OR REPLACE FUNCTION update_settings_and_log(
+    p_user_id     uuid,
+    p_updates     jsonb,
+    p_description text
+)
+RETURNS SETOF settings
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RETURN QUERY
+    UPDATE settings AS s
+       SET (sensitivity, distance_threshold, alert_mode,
+            ultrasonic_enabled, camera_enabled, updated_by)
+         = (SELECT r.sensitivity, r.distance_threshold, r.alert_mode,
+                   r.ultrasonic_enabled, r.camera_enabled, r.updated_by
+              FROM jsonb_populate_record(s, p_updates) AS r)
+     WHERE s.user_id = p_user_id
+    RETURNING s.*;
+
+    BEGIN
+        INSERT INTO activity_logs (user_id, action, description)
+        VALUES (p_user_id, 'Settings Updated', p_description);
+    EXCEPTION WHEN OTHERS THEN
+        RAISE WARNING 'update_settings_and_log: could not log activity: %', SQLERRM;
+    END;
+END
+$$;
@@ -0,0 +1,28 @@
+-- ─────────────────────────────────────────────────────────────────────────────
+-- get_settings_by_device_token
+--
+-- GET /api/settings/device in one round trip: resolves the Pi's device
+-- token to its owner and returns the owner's settings row alongside (was a
+-- user_devices lookup followed by a settings query).
+--
+-- settings is the whole row as jsonb, NULL when the user has none yet (the
+-- API then answers with the defaults). No row at all = unknown token.
+--
+-- Run once in the Supabase SQL editor.
+-- ─────────────────────────────────────────────────────────────────────────────
+
+CREATE OR REPLACE FUNCTION get_settings_by_device_token(token text)
+RETURNS TABLE (user_id text, settings jsonb)
+LANGUAGE sql STABLE
+AS $$
+    SELECT d.user_id::text, to_jsonb(s)
+    FROM user_devices d
+    LEFT JOIN LATERAL (
+        SELECT *
+        FROM settings
+        WHERE settings.user_id = d.user_id
+        LIMIT 1
+    ) s ON true
+    WHERE d.device_token = token
+    LIMIT 1
+$$;
@@ -0,0 +1,98 @@
+-- ─────────────────────────────────────────────────────────────────────────────
+-- bump_user_statistics
+--
+-- Per-detection counters for POST /api/detections, incremented atomically
+-- in one round trip. The API used to read each counter, add one in Python
+-- and write it back; now that these writes run off the request thread (and
+-- across gunicorn workers), two detections could read the same value and
+-- one increment was lost.
+--
+-- Each bump is one INSERT … ON CONFLICT DO UPDATE SET count = count + 1
+-- against the unique (user_id, …) indexes below, so concurrent bumps
+-- serialise on the row — including the first detection for a key, which
+-- used to race (UPDATE found nothing, both callers inserted). A missing row
+-- is still created with count 1.
+--
+-- bump_counter() takes the key columns from p_match and reads the values
+-- through jsonb_populate_record(), so every value has the column's own
+-- type. Only the three counter tables are accepted.
+--
+-- Behaviour change: the three counters now move together. If one bump
+-- fails the whole call rolls back and none of them is incremented (the
+-- API logs the failure); the old per-table code could leave them out of
+-- step.
+--
+-- If an index fails to build, duplicates already exist; list them with
+--   SELECT user_id, stat_date, count(*) FROM daily_statistics
+--   GROUP BY 1, 2 HAVING count(*) > 1;
+-- (likewise for the other two) and merge them first.
+--
+-- Run once in the Supabase SQL editor.
+-- ─────────────────────────────────────────────────────────────────────────────
+
+CREATE UNIQUE INDEX IF NOT EXISTS daily_statistics_user_date_key
+    ON daily_statistics (user_id, stat_date);
+
+CREATE UNIQUE INDEX IF NOT EXISTS obstacle_statistics_user_type_key
+    ON obstacle_statistics (user_id, obstacle_type);
+
+CREATE UNIQUE INDEX IF NOT EXISTS hourly_patterns_user_hour_key
+    ON hourly_patterns (user_id, hour_range);
+
+
+CREATE OR REPLACE FUNCTION bump_counter(
+    p_table       text,
+    p_match       jsonb,
+    p_count_field text,
+    p_at          timestamptz
+)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    cols text;
+    vals text;
+BEGIN
+    IF p_table NOT IN ('daily_statistics', 'obstacle_statistics', 'hourly_patterns') THEN
+        RAISE EXCEPTION 'bump_counter: unsupported table %', p_table;
+    END IF;
+
+    SELECT string_agg(format('%I', k),   ', ' ORDER BY k),
+           string_agg(format('r.%I', k), ', ' ORDER BY k)
+      INTO cols, vals
+      FROM jsonb_object_keys(p_match) AS k;
+
+    EXECUTE format(
+        'INSERT INTO %1$I AS t (%2$s, %3$I, created_at)
+         SELECT %4$s, 1, $2
+           FROM jsonb_populate_record(NULL::%1$I, $1) AS r
+         ON CONFLICT (%2$s)
+         DO UPDATE SET %3$I = t.%3$I + 1, updated_at = $2',
+        p_table, cols, p_count_field, vals
+    ) USING p_match, p_at;
+END
+$$;
+
+
+CREATE OR REPLACE FUNCTION bump_user_statistics(
+    p_user_id       text,
+    p_stat_date     text,
+    p_obstacle_type text,
+    p_hour_range    text,
+    p_at            timestamptz
+)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM bump_counter('daily_statistics',
+        jsonb_build_object('user_id', p_user_id, 'stat_date', p_stat_date),
+        'total_alerts', p_at);
+    PERFORM bump_counter('obstacle_statistics',
+        jsonb_build_object('user_id', p_user_id, 'obstacle_type', p_obstacle_type),
+        'total_count', p_at);
+    PERFORM bump_counter('hourly_patterns',
+        jsonb_build_object('user_id', p_user_id, 'hour_range', p_hour_range),
+        'detection_count', p_at);
+END
+$$;